@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+"""
+Benchmark of the documentation rendering stages on a synthetic collection
+
+Each run renders all modules of the generated collection with fresh caches
+and measures the time spent in each stage. The best run of each stage is
+reported and, together with all runs, stored in a JSON file that can be
+compared with the results of another version using --baseline.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import os.path
+import platform
+import sys
+import tempfile
+import time
+
+import generate
+
+RESULTS_FORMAT = 1
+
+STAGES = ("extract", "normalize", "markup", "render", "write")
+
+DISTRIBUTIONS = (
+    "ansible-doc-extractor", "ansible-core", "jinja2", "antsibull-docs-parser",
+    "PyYAML",
+)
+
+
+class Timer:
+    """
+    Accumulates time spent in instrumented functions
+
+    Only the outermost call of a function is timed, so recursion and
+    re-entry are not counted twice.
+    """
+
+    def __init__(self):
+        self.totals = {}
+        self._active = set()
+
+    def wrap(self, function, name):
+        self.totals.setdefault(name, 0.0)
+
+        def timed(*args, **kwargs):
+            if name in self._active:
+                return function(*args, **kwargs)
+            self._active.add(name)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.totals[name] += time.perf_counter() - start
+                self._active.discard(name)
+
+        return timed
+
+    def patch(self, module, attribute, name):
+        original = getattr(module, attribute)
+        setattr(module, attribute, self.wrap(original, name))
+        return original
+
+    def reset(self):
+        for name in self.totals:
+            self.totals[name] = 0.0
+
+
+class TimedTemplate:
+    def __init__(self, template, timer):
+        self.render = timer.wrap(template.render, "template")
+
+
+def get_stages(totals):
+    # Stages are exclusive: markup conversion happens while the template is
+    # rendered and normalization is what extraction does after reading the
+    # docstring.
+    return dict(
+        extract=totals["get_docstring"],
+        normalize=totals["extract_module_docs"] - totals["get_docstring"],
+        markup=totals["convert_markup"],
+        render=totals["template"] - totals["convert_markup"],
+        write=totals["write_file"],
+    )
+
+
+def instrument(render, output, timer):
+    timer.patch(render, "get_docstring", "get_docstring")
+    timer.patch(render, "extract_module_docs", "extract_module_docs")
+    timer.patch(render, "convert_markup", "convert_markup")
+    timer.patch(output, "write_file", "write_file")
+
+
+def run(render, renderer, modules, output_dir, timer):
+    options = renderer.options
+    renderer.fragment_cache = render.get_fragment_cache(options.engine)
+    render.configure_markup_cache(options.markup_cache_size)
+    render.configure_subtree_cache(options.subtree_cache_size)
+    timer.reset()
+
+    with open(os.devnull, "w") as devnull:
+        with contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            for module in modules:
+                renderer.render(output_dir, module)
+            total = time.perf_counter() - start
+
+    stages = get_stages(timer.totals)
+    stages["total"] = total
+    return stages
+
+
+def get_versions():
+    from ansible_doc_extractor import cache
+
+    versions = {
+        name: cache.get_distribution_version(name) for name in DISTRIBUTIONS
+    }
+    versions["python"] = platform.python_version()
+    return versions
+
+
+def summarize(runs, module_count):
+    best = {name: min(r[name] for r in runs) for name in runs[0]}
+    return dict(
+        stages=best,
+        per_module={
+            name: value / module_count for name, value in best.items()
+        },
+        runs=runs,
+    )
+
+
+def print_summary(summary, baseline=None):
+    total = summary["stages"]["total"]
+    print("{:<10} {:>10} {:>12} {:>7}{}".format(
+        "stage", "total ms", "ms/module", "share",
+        "  vs baseline" if baseline else "",
+    ))
+    for name in STAGES + ("total",):
+        value = summary["stages"][name]
+        line = "{:<10} {:>10.1f} {:>12.3f} {:>6.1%}".format(
+            name, value * 1000, summary["per_module"][name] * 1000,
+            value / total if total else 0,
+        )
+        if baseline:
+            line += "  {:+.1%}".format(get_change(baseline, summary, name))
+        print(line)
+
+
+def get_change(baseline, summary, name):
+    old = baseline["per_module"][name]
+    if old == 0:
+        return 0.0
+    return summary["per_module"][name] / old - 1
+
+
+def find_regressions(baseline, summary, threshold, noise=0.0001):
+    # Stages that take less than the noise floor per module are too short to
+    # compare reliably.
+    return [
+        name for name in STAGES + ("total",)
+        if summary["per_module"][name] > noise
+        and get_change(baseline, summary, name) > threshold
+    ]
+
+
+def create_argument_parser():
+    parser = argparse.ArgumentParser(
+        description="Benchmark documentation rendering stages",
+    )
+    generate.add_generator_arguments(parser)
+    parser.add_argument(
+        "--engine", choices=("ansible", "static"), default="ansible",
+        help="Documentation extraction engine (default: ansible)",
+    )
+    parser.add_argument(
+        "--markdown", action="store_true",
+        help="Render markdown instead of rst",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3,
+        help="Number of runs; the best run of each stage is reported "
+        "(default: 3)",
+    )
+    parser.add_argument(
+        "--output", "-o",
+        help="Write the results to this JSON file",
+    )
+    parser.add_argument(
+        "--baseline",
+        help="Compare the results with this JSON results file",
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=0.2,
+        help="Relative slowdown per module compared to the baseline that "
+        "counts as a regression (default: 0.2)",
+    )
+    return parser
+
+
+def main():
+    args = create_argument_parser().parse_args()
+    generator = generate.create_generator(args)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        root = generator.write(workdir)
+        modules = sorted(
+            os.path.join(root, "plugins", "modules", name)
+            for name in os.listdir(os.path.join(root, "plugins", "modules"))
+        )
+        output_dir = os.path.join(workdir, "output")
+        os.mkdir(output_dir)
+
+        # Ansible reads the collection path when it is imported.
+        os.environ["ANSIBLE_COLLECTIONS_PATH"] = workdir
+        from ansible_doc_extractor import output, render
+
+        timer = Timer()
+        instrument(render, output, timer)
+        options = render.create_options(
+            None, args.markdown, engine=args.engine, template_cache=False,
+        )
+        renderer = render.Renderer(options)
+        renderer.templates = [
+            (folder, TimedTemplate(template, timer), extension)
+            for folder, template, extension in renderer.templates
+        ]
+        runs = [
+            run(render, renderer, modules, output_dir, timer)
+            for _ in range(args.repeat)
+        ]
+
+    summary = summarize(runs, len(modules))
+    results = dict(
+        format=RESULTS_FORMAT,
+        versions=get_versions(),
+        parameters=dict(
+            modules=args.modules, depth=args.depth, width=args.width,
+            fragments=args.fragments,
+            fragments_per_module=args.fragments_per_module,
+            examples=args.examples, samples=args.samples,
+            fragment_depth=args.fragment_depth, seed=args.seed,
+            engine=args.engine,
+            markdown=args.markdown, repeat=args.repeat,
+        ),
+        **summary
+    )
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as fd:
+            baseline = json.load(fd)
+        if baseline["parameters"] != results["parameters"]:
+            print(
+                "warning: baseline was measured with different parameters",
+                file=sys.stderr,
+            )
+    print_summary(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as fd:
+            json.dump(results, fd, indent=2)
+            fd.write("\n")
+
+    if baseline:
+        regressions = find_regressions(baseline, results, args.threshold)
+        if regressions:
+            sys.exit("Regressions in: {}".format(", ".join(regressions)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+"""
+Generator of synthetic collections for benchmarks
+
+The generated collection is installed into an ansible_collections tree, so
+both extraction engines can find its doc fragments. Its content depends only
+on the parameters and the seed.
+"""
+
+import argparse
+import os
+import os.path
+import random
+
+import yaml
+
+NAMESPACE = "bench"
+NAME = "synthetic"
+COLLECTION = NAMESPACE + "." + NAME
+
+WORDS = """
+    address agent api backend bucket certificate check client cluster config
+    connection credential database default entity event filter group handler
+    hook host identity instance interval key label limit metadata mutator
+    namespace node object option output path payload policy port provider
+    proxy queue record region request resource role rule secret selector
+    server service session silence state subscription tag target task timeout
+    token type user value version
+""".split()
+
+TYPES = ("str", "int", "bool", "list", "dict", "path")
+
+
+class Generator:
+    def __init__(self, modules=50, depth=2, width=4, fragments=5,
+                 fragments_per_module=2, examples=20, samples=0,
+                 fragment_depth=0, seed=0):
+        self.modules = modules
+        self.depth = depth
+        self.width = width
+        self.fragments = fragments
+        self.fragments_per_module = min(fragments_per_module, fragments)
+        self.examples = examples
+        self.samples = samples
+        self.fragment_depth = fragment_depth
+        self.random = random.Random(seed)
+
+    def words(self, count):
+        return " ".join(self.random.choice(WORDS) for _ in range(count))
+
+    def sentence(self, names):
+        # Sentences use the markup that the templates convert, including
+        # references to other plugins and options.
+        markup = self.random.choice((
+            "C({})".format(self.random.choice(WORDS)),
+            "O({})".format(self.random.choice(names)),
+            "M({}.module_{})".format(
+                COLLECTION, self.random.randrange(self.modules),
+            ),
+            "I({})".format(self.words(2)),
+            "U(https://example.com/{})".format(self.random.choice(WORDS)),
+        ))
+        return "{} {} {}.".format(
+            self.words(3).capitalize(), markup, self.words(5),
+        )
+
+    def description(self, names):
+        return [self.sentence(names) for _ in range(self.random.randint(1, 3))]
+
+    def options(self, prefix, depth):
+        names = [
+            "{}_{}".format(prefix, i) for i in range(self.width)
+        ]
+        options = {}
+        for name in names:
+            option = dict(
+                description=self.description(names),
+                type=self.random.choice(TYPES),
+            )
+            if self.random.random() < 0.3:
+                option["required"] = True
+            if option["type"] == "str" and self.random.random() < 0.3:
+                option["choices"] = sorted(set(
+                    self.random.choice(WORDS) for _ in range(4)
+                ))
+            if depth > 0:
+                option["type"] = "dict"
+                option["suboptions"] = self.options(name, depth - 1)
+            options[name] = option
+        return options
+
+    def returns(self, prefix, depth):
+        names = [
+            "{}_{}".format(prefix, i) for i in range(self.width)
+        ]
+        values = {}
+        for name in names:
+            value = dict(
+                description=self.sentence(names),
+                returned="success",
+                type=self.random.choice(TYPES),
+                sample=self.random.choice(WORDS),
+            )
+            if self.samples:
+                value["type"] = "list"
+                value["sample"] = [
+                    {word: self.words(3) for word in self.words(4).split()}
+                    for _ in range(self.samples)
+                ]
+            if depth > 0:
+                value["type"] = "dict"
+                value["contains"] = self.returns(name, depth - 1)
+            values[name] = value
+        return values
+
+    def examples_text(self, module):
+        tasks = []
+        for i in range(self.examples):
+            tasks.append(dict(
+                name=self.words(4).capitalize(),
+                **{COLLECTION + "." + module: dict(
+                    name=self.random.choice(WORDS),
+                    state=self.random.choice(("present", "absent")),
+                    value=i,
+                )}
+            ))
+        return yaml.safe_dump(tasks, sort_keys=False)
+
+    def module(self, index):
+        name = "module_{}".format(index)
+        fragments = self.random.sample(
+            range(self.fragments), self.fragments_per_module,
+        )
+        doc = dict(
+            module=name,
+            author=["Benchmark Author (@bench)"],
+            short_description=self.words(4).capitalize(),
+            description=self.description(["option"]),
+            version_added="1.0.0",
+            extends_documentation_fragment=[
+                "{}.fragment_{}".format(COLLECTION, i) for i in sorted(fragments)
+            ],
+            options=self.options("option", self.depth),
+        )
+        return MODULE_TEMPLATE.format(
+            documentation=yaml.safe_dump(doc, sort_keys=False),
+            examples=self.examples_text(name),
+            returns=yaml.safe_dump(
+                self.returns("result", self.depth), sort_keys=False,
+            ),
+        )
+
+    def fragment(self, index):
+        doc = dict(
+            options=self.options(
+                "fragment_{}".format(index), self.fragment_depth,
+            ),
+            notes=[self.sentence(["option"])],
+        )
+        return FRAGMENT_TEMPLATE.format(
+            documentation=yaml.safe_dump(doc, sort_keys=False),
+        )
+
+    def write(self, path):
+        """
+        Write the collection into the ansible_collections tree at path and
+        return the root of the collection
+        """
+        root = os.path.join(path, "ansible_collections", NAMESPACE, NAME)
+        files = [("galaxy.yml", yaml.safe_dump(dict(
+            namespace=NAMESPACE, name=NAME, version="1.0.0",
+        )))]
+        files.extend(
+            ("plugins/doc_fragments/fragment_{}.py".format(i), self.fragment(i))
+            for i in range(self.fragments)
+        )
+        files.extend(
+            ("plugins/modules/module_{}.py".format(i), self.module(i))
+            for i in range(self.modules)
+        )
+
+        for name, content in files:
+            file_path = os.path.join(root, name)
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path, "w") as fd:
+                fd.write(content)
+        return root
+
+
+MODULE_TEMPLATE = '''\
+#!/usr/bin/python
+
+DOCUMENTATION = r"""
+{documentation}"""
+
+EXAMPLES = r"""
+{examples}"""
+
+RETURN = r"""
+{returns}"""
+'''
+
+FRAGMENT_TEMPLATE = '''\
+class ModuleDocFragment(object):
+    DOCUMENTATION = r"""
+{documentation}"""
+'''
+
+
+def add_generator_arguments(parser):
+    parser.add_argument(
+        "--modules", type=int, default=50,
+        help="Number of modules (default: 50)",
+    )
+    parser.add_argument(
+        "--depth", type=int, default=2,
+        help="Nesting depth of suboptions and contains (default: 2)",
+    )
+    parser.add_argument(
+        "--width", type=int, default=4,
+        help="Number of options on each nesting level (default: 4)",
+    )
+    parser.add_argument(
+        "--fragments", type=int, default=5,
+        help="Number of shared doc fragments (default: 5)",
+    )
+    parser.add_argument(
+        "--fragments-per-module", type=int, default=2,
+        help="Number of doc fragments each module extends (default: 2)",
+    )
+    parser.add_argument(
+        "--examples", type=int, default=20,
+        help="Number of tasks in EXAMPLES (default: 20)",
+    )
+    parser.add_argument(
+        "--samples", type=int, default=0,
+        help="Number of entries in each return value sample (default: 0)",
+    )
+    parser.add_argument(
+        "--fragment-depth", type=int, default=0,
+        help="Nesting depth of doc fragment suboptions (default: 0)",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0,
+        help="Seed for the generated content (default: 0)",
+    )
+
+
+def create_generator(args):
+    return Generator(
+        args.modules, args.depth, args.width, args.fragments,
+        args.fragments_per_module, args.examples, args.samples,
+        args.fragment_depth, args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic collection",
+    )
+    parser.add_argument(
+        "path", help="Directory for the ansible_collections tree",
+    )
+    add_generator_arguments(parser)
+    args = parser.parse_args()
+    print(create_generator(args).write(args.path))
+
+
+if __name__ == "__main__":
+    main()
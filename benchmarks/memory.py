@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""
+Peak memory of rendering a very large module with and without streaming
+
+The module is extracted once and then rendered and written in each mode
+while tracemalloc records the peak of the memory that Python allocates on
+top of the documentation. The peak resident set size is no use here, since
+extraction needs far more memory than rendering and the freed memory is
+reused.
+"""
+
+import argparse
+import json
+import os.path
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import generate
+
+MODES = ("render", "stream")
+
+
+def measure(template, doc, path, mode):
+    """
+    Render and write the document and return the peak of the traced memory
+    and the time that it took
+    """
+    from ansible_doc_extractor import output
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    if mode == "stream":
+        output.write_chunks(path, template.generate(doc))
+    else:
+        output.write_file(path, template.render(doc))
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return dict(peak=peak, time=elapsed, size=os.path.getsize(path))
+
+
+def create_argument_parser():
+    parser = argparse.ArgumentParser(
+        description="Measure peak memory of rendering a large module",
+    )
+    generate.add_generator_arguments(parser)
+    parser.set_defaults(modules=1, depth=3, width=12, examples=200)
+    parser.add_argument(
+        "--markdown", action="store_true",
+        help="Render markdown instead of rst",
+    )
+    parser.add_argument(
+        "--output", "-o",
+        help="Write the results to this JSON file",
+    )
+    return parser
+
+
+def main():
+    args = create_argument_parser().parse_args()
+    from ansible_doc_extractor import render
+
+    generator = generate.create_generator(args)
+    with tempfile.TemporaryDirectory() as workdir:
+        root = generator.write(workdir)
+        module = os.path.join(root, "plugins", "modules", "module_0.py")
+        os.environ["ANSIBLE_COLLECTIONS_PATH"] = workdir
+
+        options = render.create_options(
+            None, args.markdown, template_cache=False, markup_cache_size=0,
+        )
+        renderer = render.Renderer(options)
+        print("Extracting {}".format(module), file=sys.stderr)
+        doc, _ = render.extract_module_docs(module, renderer.fragment_cache)
+        _, template, extension = renderer.templates[0]
+
+        results = {}
+        for mode in MODES:
+            path = os.path.join(workdir, "{}.{}".format(mode, extension))
+            results[mode] = measure(template, doc, path, mode)
+
+    print("{:<8} {:>12} {:>14} {:>10}".format(
+        "mode", "document MB", "peak MB", "time s",
+    ))
+    for mode, result in results.items():
+        print("{:<8} {:>12.1f} {:>14.1f} {:>10.2f}".format(
+            mode, result["size"] / 2 ** 20, result["peak"] / 2 ** 20,
+            result["time"],
+        ))
+
+    if args.output:
+        with open(args.output, "w") as fd:
+            json.dump(results, fd, indent=2)
+            fd.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+"""
+Benchmark of the YAML backends on modules with large RETURN blocks
+
+The RETURN blocks of the generated modules are parsed on their own, and the
+whole documentation is extracted with the static engine, which parses all
+YAML with the selected backend. The best of several runs is reported for
+each backend.
+"""
+
+import argparse
+import ast
+import contextlib
+import glob
+import json
+import os
+import os.path
+import tempfile
+import time
+
+import generate
+
+
+def read_returns(modules):
+    returns = []
+    for module in modules:
+        with open(module) as fd:
+            tree = ast.parse(fd.read(), module)
+        for node in tree.body:
+            if (isinstance(node, ast.Assign) and
+                    getattr(node.targets[0], "id", None) == "RETURN"):
+                returns.append(ast.literal_eval(node.value))
+    return returns
+
+
+def best_time(function, runs):
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def measure(backend, modules, returns, runs):
+    from ansible_doc_extractor import render, yamlbackend
+
+    yamlbackend.configure(backend)
+
+    def parse():
+        for text in returns:
+            yamlbackend.safe_load(text)
+
+    def extract():
+        fragment_cache = render.get_fragment_cache("static")
+        for module in modules:
+            render.extract_module_docs(module, fragment_cache, "static")
+
+    with open(os.devnull, "w") as devnull:
+        with contextlib.redirect_stdout(devnull):
+            return dict(
+                parse=best_time(parse, runs),
+                extract=best_time(extract, runs),
+            )
+
+
+def create_argument_parser():
+    parser = argparse.ArgumentParser(
+        description="Compare YAML backends on modules with large RETURN blocks",
+    )
+    generate.add_generator_arguments(parser)
+    parser.set_defaults(modules=10, samples=20)
+    parser.add_argument(
+        "--runs", type=int, default=3,
+        help="Number of runs of each backend (default: 3)",
+    )
+    parser.add_argument(
+        "--output", "-o",
+        help="Write the results to this JSON file",
+    )
+    return parser
+
+
+def main():
+    args = create_argument_parser().parse_args()
+    from ansible_doc_extractor import yamlbackend
+
+    # The backend that --yaml-backend auto picks on this machine.
+    yamlbackend.configure("auto")
+    default = yamlbackend.get_backend()
+
+    backends = ["python"]
+    if yamlbackend.HAS_LIBYAML:
+        backends.append("libyaml")
+
+    generator = generate.create_generator(args)
+    with tempfile.TemporaryDirectory() as workdir:
+        root = generator.write(workdir)
+        os.environ["ANSIBLE_COLLECTIONS_PATH"] = workdir
+        modules = sorted(glob.glob(
+            os.path.join(root, "plugins", "modules", "*.py"),
+        ))
+        returns = read_returns(modules)
+        size = sum(len(text) for text in returns)
+
+        results = {}
+        for backend in backends:
+            results[backend] = measure(backend, modules, returns, args.runs)
+
+    print("RETURN blocks: {}, {:.1f} MB".format(len(returns), size / 2 ** 20))
+    print("Default backend: {}".format(default))
+    print("{:<8} {:>10} {:>10}".format("backend", "parse s", "extract s"))
+    for backend, result in results.items():
+        print("{:<8} {:>10.3f} {:>10.3f}".format(
+            backend, result["parse"], result["extract"],
+        ))
+    if "libyaml" in results:
+        print("libyaml speedup: parse {:.1f}x, extract {:.1f}x".format(
+            results["python"]["parse"] / results["libyaml"]["parse"],
+            results["python"]["extract"] / results["libyaml"]["extract"],
+        ))
+
+    if args.output:
+        with open(args.output, "w") as fd:
+            json.dump(
+                dict(size=size, default=default, results=results), fd,
+                indent=2,
+            )
+            fd.write("\n")
+
+
+if __name__ == "__main__":
+    main()
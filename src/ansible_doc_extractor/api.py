@@ -0,0 +1,78 @@
+"""
+Library API that extracts and renders documentation in-process
+
+    from ansible_doc_extractor.api import extract, render
+
+    doc = extract("plugins/modules/user.py")
+    text = render(doc)
+
+Ansible's plugin loader, the parsed doc fragments, and the compiled templates
+are kept for the lifetime of the process, so only the first call pays for
+loading them. Doc fragments that change on disk are parsed again.
+"""
+
+from ansible_doc_extractor import render as rendering, watch
+
+_fragment_caches = {}
+
+
+def get_fragment_cache(engine="ansible", cache_dir=None):
+    """
+    Return the fragment cache of the engine, initializing the engine on
+    first use
+    """
+    key = engine, cache_dir
+    if key not in _fragment_caches:
+        rendering.init_engine(engine)
+        _fragment_caches[key] = rendering.get_fragment_cache(engine, cache_dir)
+    return _fragment_caches[key]
+
+
+def extract_docs(path, engine="ansible", plugin_type=None,
+                 collection_name=None, cache_dir=None):
+    """
+    Return the documentation of the plugin in the file and the paths of the
+    doc fragments that it extends
+
+    The engine is ansible, static, or dump for files written by --dump-json
+    and --dump-msgpack. The plugin type and the collection name, when known,
+    resolve references to the plugin itself. With cache_dir set, parsed doc
+    fragments are also stored there.
+    """
+    fragment_cache = get_fragment_cache(engine, cache_dir)
+    watch.refresh_fragments(fragment_cache)
+    return rendering.extract_module_docs(
+        path, fragment_cache, engine, plugin_type, collection_name,
+    )
+
+
+def extract(path, engine="ansible", plugin_type=None, collection_name=None,
+            cache_dir=None):
+    """
+    Return the documentation of the plugin in the file, which render() turns
+    into a document
+    """
+    return extract_docs(
+        path, engine, plugin_type, collection_name, cache_dir,
+    )[0]
+
+
+def get_template(template=None, output_format="rst", engine="ansible",
+                 cache_dir=None):
+    """
+    Return the compiled template from the template file, or the built-in
+    template of the format when template is None
+    """
+    return rendering.get_cached_template(
+        template, output_format, rendering.get_template_cache_dir(cache_dir),
+        engine,
+    )[0]
+
+
+def render(doc, template=None, output_format="rst", engine="ansible",
+           cache_dir=None):
+    """
+    Return the documentation from extract() rendered with the template
+    file, or with the built-in template of the format (rst or md)
+    """
+    return get_template(template, output_format, engine, cache_dir).render(doc)
@@ -0,0 +1,83 @@
+import contextlib
+import io
+import sys
+import tarfile
+import time
+import zipfile
+
+from ansible_doc_extractor import output
+
+FORMATS = ("tar", "tar.gz", "zip")
+
+
+class TarArchive:
+    """
+    Tar archive that is written as a stream
+
+    Each member is written out as soon as it is added, so memory use does
+    not grow with the number of documents and the archive can be written to
+    a pipe.
+    """
+
+    def __init__(self, fd, compression=""):
+        self._tar = tarfile.open(fileobj=fd, mode="w|" + compression)
+        self._mtime = int(time.time())
+
+    def add(self, name, data):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = self._mtime
+        info.mode = output.get_file_mode()
+        self._tar.addfile(info, io.BytesIO(data))
+
+    def close(self):
+        self._tar.close()
+
+
+class ZipArchive:
+    """
+    Zip archive that is written as a stream
+
+    Zip files end with a directory of their members, so a small record of
+    each member stays in memory until the archive is closed.
+    """
+
+    def __init__(self, fd):
+        self._zip = zipfile.ZipFile(fd, "w", zipfile.ZIP_DEFLATED)
+        self._date_time = time.localtime()[:6]
+
+    def add(self, name, data):
+        info = zipfile.ZipInfo(name, self._date_time)
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.external_attr = output.get_file_mode() << 16
+        self._zip.writestr(info, data)
+
+    def close(self):
+        self._zip.close()
+
+
+def create_archive(fd, archive_format):
+    if archive_format == "zip":
+        return ZipArchive(fd)
+    if archive_format == "tar.gz":
+        return TarArchive(fd, "gz")
+    return TarArchive(fd)
+
+
+@contextlib.contextmanager
+def open_archive(path, archive_format):
+    """
+    Open an archive of the format at path, or on standard output if path is
+    -, for adding documents. Archive files are replaced atomically.
+    """
+    if path == "-":
+        archive = create_archive(sys.stdout.buffer, archive_format)
+        yield archive
+        archive.close()
+        sys.stdout.buffer.flush()
+        return
+
+    with output.atomic_open(path) as fd:
+        archive = create_archive(fd, archive_format)
+        yield archive
+        archive.close()
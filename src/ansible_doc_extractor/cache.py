@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import os.path
+import tempfile
+
+try:
+    from importlib import metadata as importlib_metadata
+except ImportError:  # Python < 3.8
+    try:
+        import importlib_metadata
+    except ImportError:
+        importlib_metadata = None
+
+
+# Bump this when the layout of the cache file changes.
+CACHE_FORMAT = 3
+
+CACHE_FILE = "build-cache.json"
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_text(text):
+    return hash_bytes(text.encode("utf-8"))
+
+
+def hash_file(path):
+    try:
+        with open(path, "rb") as fd:
+            return hash_bytes(fd.read())
+    except OSError:
+        return None
+
+
+def get_distribution_version(name):
+    if importlib_metadata is None:
+        return _get_setuptools_distribution_version(name)
+    try:
+        return importlib_metadata.version(name)
+    except importlib_metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def _get_setuptools_distribution_version(name):
+    try:
+        import pkg_resources
+    except ImportError:
+        return "unknown"
+    try:
+        return pkg_resources.get_distribution(name).version
+    except pkg_resources.DistributionNotFound:
+        return "unknown"
+
+
+def get_tool_version():
+    return get_distribution_version("ansible-doc-extractor")
+
+
+def get_user_cache_dir():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache",
+    )
+    return os.path.join(base, "ansible-doc-extractor")
+
+
+def get_template_cache_dir(cache_dir=None, environment=""):
+    """
+    Return the directory for compiled templates, which is in the build cache
+    directory if set and in the user's cache directory otherwise
+
+    Jinja2 only checks the template source of compiled templates, so the
+    directory is specific to the installed Jinja2 version, the version of
+    this tool, and the environment description, such as the options and
+    filters of the Jinja2 environment.
+    """
+    if cache_dir is None:
+        cache_dir = get_user_cache_dir()
+    key = hash_text(json.dumps([get_tool_version(), environment]))
+    return os.path.join(
+        cache_dir, "templates",
+        "jinja2-{}-{}".format(get_distribution_version("jinja2"), key[:16]),
+    )
+
+
+def get_build_key(template_source, extension, ansible_version):
+    """
+    Return the part of the cache key that is shared by all modules: the
+    template, the output format and versions of the tools that render it.
+    """
+    return hash_text(json.dumps([
+        CACHE_FORMAT,
+        get_tool_version(),
+        ansible_version,
+        extension,
+        hash_text(template_source),
+    ]))
+
+
+class BuildCache:
+    """
+    Persistent record of rendered modules that allows skipping modules whose
+    sources, doc fragments, and template did not change since the last run.
+    """
+
+    def __init__(self, directory, build_key):
+        self.directory = directory
+        self.path = os.path.join(directory, CACHE_FILE)
+        self.build_key = build_key
+        self.entries = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as fd:
+                data = json.load(fd)
+        except (OSError, ValueError):
+            return {}
+        if data.get("format") != CACHE_FORMAT:
+            return {}
+        return data.get("modules", {})
+
+    def is_fresh(self, module, output_folders, references=False):
+        """
+        Return True if the module does not need to be rendered into the
+        output folders (one for each output) again
+
+        With references set, entries without the references of the module
+        are not fresh.
+        """
+        entry = self.entries.get(os.path.abspath(module))
+        if entry is None or entry["key"] != self.build_key:
+            return False
+        if references and entry.get("references") is None:
+            return False
+
+        outputs = entry["outputs"]
+        if len(outputs) != len(output_folders):
+            return False
+        for output, folder in zip(outputs, output_folders):
+            if os.path.dirname(output) != os.path.abspath(folder):
+                return False
+            if not os.path.isfile(output):
+                return False
+
+        if hash_file(module) != entry["source"]:
+            return False
+        return all(
+            hash_file(path) == digest
+            for path, digest in entry["fragments"].items()
+        )
+
+    def update(self, module, outputs, fragments, summary=None,
+               references=None):
+        self.entries[os.path.abspath(module)] = dict(
+            key=self.build_key,
+            source=hash_file(module),
+            outputs=[os.path.abspath(output) for output in outputs],
+            fragments={path: hash_file(path) for path in fragments},
+            summary=summary,
+            references=references,
+        )
+
+    def get_entry(self, module):
+        return self.entries[os.path.abspath(module)]
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        with os.fdopen(fd, "w") as tmp:
+            json.dump(dict(format=CACHE_FORMAT, modules=self.entries), tmp)
+        os.replace(tmp_path, self.path)
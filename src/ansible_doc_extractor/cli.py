@@ -1,150 +1,59 @@
+# Keep imports in this module light. Ansible, Jinja2, and the markup parser
+# are only imported once we know that we need to render something, which
+# keeps --help and argument errors fast.
 import argparse
-import os.path
-import re
 import sys
 
-try:
-    from ansible.plugins.filter.core import to_yaml
-    from ansible.plugins.loader import fragment_loader
-    from ansible.utils import plugin_docs
-    HAS_ANSIBLE = True
-    try:
-        from ansible.plugins.loader import init_plugin_loader
-    except ImportError:
-        pass
-except ImportError:
-    HAS_ANSIBLE = False
-
-from jinja2 import Environment, PackageLoader
-from jinja2.utils import pass_context
-
-from antsibull_docs_parser import dom
-from antsibull_docs_parser.parser import parse, Context
-from antsibull_docs_parser.rst import to_rst_plain
-from antsibull_docs_parser.md import to_md
-
-import yaml
-
-
-_supported_templates = ["rst", "md"]
-
-
-def get_context(j2_context):
-    params = {}
-    plugin_collection = j2_context.get('collection')
-    plugin_name = j2_context.get('module')
-    plugin_type = j2_context.get('plugin_type')
-    if plugin_collection is not None and plugin_name is not None and plugin_type is not None:
-        params['current_plugin'] = dom.PluginIdentifier(fqcn=f"{plugin_collection}.{plugin_name}", type=plugin_type)
-    return Context(**params)
-
-
-@pass_context
-def rst_ify(j2_context, text):
-    return to_rst_plain(parse(text, get_context(j2_context)))
-
-
-@pass_context
-def md_ify(j2_context, text):
-    return to_md(parse(text, get_context(j2_context)))
-
-
-def ensure_list(value):
-    if isinstance(value, list):
-        return value
-    return [value]
-
-
-def convert_descriptions(data):
-    for definition in data.values():
-        if "description" in definition:
-            definition["description"] = ensure_list(definition["description"])
-        if "suboptions" in definition:
-            convert_descriptions(definition["suboptions"])
-        if "contains" in definition:
-            convert_descriptions(definition["contains"])
-
-
-def render_module_docs(output_folder, module, template, extension):
-    print("Rendering {}".format(module))
-    doc, examples, returndocs, metadata = plugin_docs.get_docstring(
-        module, fragment_loader,
-    )
-
-    returndocs = returndocs or {}
-    if isinstance(returndocs, str):
-        returndocs = yaml.safe_load(returndocs)
-
-    doc.update(
-        examples=examples,
-        returndocs=returndocs,
-        metadata=metadata,
-    )
-
-    doc["author"] = ensure_list(doc["author"])
-    doc["description"] = ensure_list(doc["description"])
-    convert_descriptions(doc.get("options", {}))
-    convert_descriptions(doc["returndocs"])
 
-    if "module" in doc:
-        name = doc["module"]
-        doc["plugin_type"] = "module"
-    else:
-        name = doc["name"].split(".")[-1]
-        doc["module"] = name
-
-    output_path = os.path.join(
-        output_folder, doc["module"] + "." + extension
-    )
-    with open(output_path, "w") as fd:
-        fd.write(template.render(doc))
-
-
-def get_default_template(env, markdown):
-    if markdown:
-        return env.get_template("module.md.j2")
-    return env.get_template("module.rst.j2")
+class ArgParser(argparse.ArgumentParser):
+    """
+    Argument parser that displays help on error
+    """
 
+    def error(self, message):
+        sys.stderr.write("error: {}\n".format(message))
+        self.print_help()
+        sys.exit(2)
 
-def get_template(custom_template, markdown):
-    env = Environment(loader=PackageLoader("ansible_doc_extractor"), trim_blocks=True)
-    env.filters["rst_ify"] = rst_ify
-    env.filters["md_ify"] = md_ify
-    env.filters["to_yaml"] = to_yaml
 
-    if custom_template:
-        template = env.from_string(custom_template.read())
-        custom_template.close()
-    else:
-        template = get_default_template(env, markdown)
+def non_negative_int(value):
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid int value: '{}'".format(value))
+    if number < 0:
+        raise argparse.ArgumentTypeError("value must not be negative")
+    return number
 
-    if markdown:
-        extension = "md"
-    else:
-        extension = "rst"
 
-    return template, extension
+def positive_int(value):
+    number = non_negative_int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError("value must be at least 1")
+    return number
 
 
-def render_docs(output, modules, custom_template, markdown):
-    template, extension = get_template(custom_template, markdown)
+def shard_argument(value):
+    index, sep, count = value.partition("/")
     try:
-        init_plugin_loader()
-    except NameError:
-        pass
-    for module in modules:
-        render_module_docs(output, module, template, extension)
-
+        index, count = int(index), int(count)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            "invalid shard: '{}', expected INDEX/COUNT".format(value)
+        )
+    if not sep or not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(
+            "shard index must be between 1 and the shard count"
+        )
+    return index, count
 
-class ArgParser(argparse.ArgumentParser):
-    """
-    Argument parser that displays help on error
-    """
 
-    def error(self, message):
-        sys.stderr.write("error: {}\n".format(message))
-        self.print_help()
-        sys.exit(2)
+def template_argument(value):
+    # PATH:EXTENSION renders the template into an output of its own.
+    path, sep, extension = value.rpartition(":")
+    if not sep or not extension or "/" in extension or "\\" in extension:
+        path, extension = value, None
+    return argparse.FileType("r")(path), extension
 
 
 def create_argument_parser():
@@ -152,32 +61,478 @@ def create_argument_parser():
         description="Ansible documentation extractor"
     )
     parser.add_argument(
-        "output", help="Output folder",
+        "output", help="Output folder, or output file with --archive",
     )
     parser.add_argument(
-        "module", nargs="+",
+        "module", nargs="*",
         help="Module to extract documentation from",
     )
     parser.add_argument(
-        "--template", type=argparse.FileType('r'),
+        "--collection", metavar="PATH",
+        help="""Root of a collection whose plugins (modules, lookup,
+        inventory, filter, and other plugins) are all documented. Output files
+        are written into a subfolder for each plugin type.
+        """
+    )
+    parser.add_argument(
+        "--template", type=template_argument, action="append", default=[],
+        metavar="TEMPLATE[:EXTENSION]",
         help="""Custom Jinja2 template used to generate documentation.
         If option --markdown" is also listed, template must be md specific.
+        With an extension, such as site.j2:html, the template renders files
+        with that extension into a subfolder of the same name, next to other
+        templates and formats. Can be used multiple times.
         """
     )
     parser.add_argument(
         "--markdown", action='store_true',
         help="""Generate markdown output files instead of rst (default)."""
     )
+    parser.add_argument(
+        "--format", choices=("rst", "md"), action="append",
+        default=[],
+        help="""Render documentation in this format into a subfolder of the
+        same name. Can be used multiple times, for example --format rst
+        --format md, to extract the documentation once and render it in
+        several formats.
+        """
+    )
+    parser.add_argument(
+        "--jobs", "-j", type=positive_int,
+        help="""Number of processes used to render documentation
+        (default: number of CPU cores).
+        """
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="""Directory with the incremental build cache. Modules whose
+        source, doc fragments, and template did not change since the last run
+        are not rendered again.
+        """
+    )
+    parser.add_argument(
+        "--engine", choices=("ansible", "static"), default="ansible",
+        help="""Documentation extraction engine. The static engine reads the
+        documentation without importing ansible or the plugin code and looks
+        up doc fragments on the collection path (default: ansible).
+        """
+    )
+    parser.add_argument(
+        "--markup-cache-size", type=non_negative_int, default=8192,
+        help="""Maximum number of converted markup strings that are kept in
+        memory for reuse. Set to 0 to disable the cache (default: 8192).
+        """
+    )
+    parser.add_argument(
+        "--subtree-cache-size", type=non_negative_int, default=1024,
+        help="""Maximum number of rendered option and return value subtrees,
+        such as options from shared doc fragments, that are kept in memory for
+        reuse. Set to 0 to disable the cache (default: 1024).
+        """
+    )
+    parser.add_argument(
+        "--yaml-backend", choices=("auto", "libyaml", "python"),
+        default="auto",
+        help="""YAML parser for the YAML that ansible does not parse, such as
+        documentation read by the static engine. auto uses libyaml if PyYAML
+        was built with it and pure Python otherwise (default: auto).
+        """
+    )
+    parser.add_argument(
+        "--no-template-cache", dest="template_cache", action="store_false",
+        help="""Do not store compiled templates in the cache directory (or in
+        the user's cache directory if --cache-dir is not set).
+        """
+    )
+    parser.add_argument(
+        "--skip-unchanged", action="store_true",
+        help="""Do not rewrite output files whose content did not change,
+        which preserves their modification times.
+        """
+    )
+    parser.add_argument(
+        "--writer-threads", type=non_negative_int, default=0,
+        help="""Number of threads that write output files in the background
+        while the next modules are rendered, which keeps slow disks and
+        network file systems from stalling rendering. Set to 0 to write files
+        right after rendering them (default: 0).
+        """
+    )
+    parser.add_argument(
+        "--write-queue-size", type=positive_int, default=64,
+        help="""Maximum number of rendered modules that wait for the
+        background writer threads. Rendering pauses when the queue is full
+        (default: 64).
+        """
+    )
+    parser.add_argument(
+        "--stream", action="store_true",
+        help="""Write documents in chunks while they are rendered instead of
+        rendering each document into memory first, which limits memory use
+        for very large modules.
+        """
+    )
+    parser.add_argument(
+        "--archive", choices=("tar", "tar.gz", "zip"),
+        help="""Write all documents into a single archive of this format
+        instead of separate files. The output argument is the path of the
+        archive, or - to write the archive to standard output.
+        """
+    )
+    parser.add_argument(
+        "--index", action="store_true",
+        help="""Also write an index page of all documented plugins, with a
+        Sphinx toctree in rst, into each output.
+        """
+    )
+    parser.add_argument(
+        "--index-template", type=template_argument, action="append",
+        default=[], metavar="TEMPLATE[:EXTENSION]",
+        help="""Custom Jinja2 template used to generate the index page,
+        optionally only for the output with the extension. Outputs of custom
+        templates only get an index page with an index template. Can be used
+        multiple times. Implies --index.
+        """
+    )
+    parser.add_argument(
+        "--check-references", action="store_true",
+        help="""Report seealso entries and M() and P() references to plugins
+        of the documented collections that do not exist.
+        """
+    )
+    parser.add_argument(
+        "--shard", type=shard_argument, metavar="INDEX/COUNT",
+        help="""Only render the INDEX-th (starting at 1) of COUNT subsets of
+        the modules, for example 2/4, so that several machines can share the
+        work. Subsets are balanced by file size and are the same on every
+        machine. Instead of index pages, a shard manifest is written into the
+        output folder. Run --merge-shards once all shards are in the output
+        folder.
+        """
+    )
+    parser.add_argument(
+        "--shard-timings", metavar="FILE",
+        help="""Balance shards by the wall times of modules in a profile
+        written by --profile-json instead of by file size. All shards must
+        use the same file.
+        """
+    )
+    parser.add_argument(
+        "--merge-shards", action="store_true",
+        help="""Combine the shard manifests in the output folder into the
+        index pages that a single run would write, and remove them. Takes no
+        modules, but the same --format, --template, and --index options as
+        the shards.
+        """
+    )
+    dump = parser.add_mutually_exclusive_group()
+    dump.add_argument(
+        "--dump-json", dest="dump_format", action="store_const",
+        const="json",
+        help="""Write the extracted documentation as JSON files instead of
+        rendering it. Use --from-json to render the files later.
+        """
+    )
+    dump.add_argument(
+        "--dump-msgpack", dest="dump_format", action="store_const",
+        const="msgpack",
+        help="""Same as --dump-json, but writes more compact MessagePack
+        files. Requires the msgpack package.
+        """
+    )
+    parser.add_argument(
+        "--from-json", action="store_true",
+        help="""Render documentation from files written by --dump-json or
+        --dump-msgpack, or from directories with such files, instead of
+        extracting it from modules. Ansible is not needed in this mode.
+        """
+    )
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="""Measure wall and CPU time of each rendering stage and module
+        and print a summary of the slowest ones.
+        """
+    )
+    parser.add_argument(
+        "--profile-json", metavar="FILE",
+        help="""Write the profile as JSON to FILE. Implies --profile.""",
+    )
+    parser.add_argument(
+        "--profile-trace", metavar="FILE",
+        help="""Write the profile to FILE in the Chrome trace event format,
+        which chrome://tracing, Perfetto, and speedscope can display.
+        Implies --profile.
+        """
+    )
+    parser.add_argument(
+        "--watch", action="store_true",
+        help="""Keep running and render the documentation again when modules,
+        doc fragments, or the template change.
+        """
+    )
     return parser
 
 
-def main():
-    if not HAS_ANSIBLE:
+def create_server_argument_parser():
+    parser = ArgParser(
+        description="Ansible documentation render server"
+    )
+    parser.add_argument(
+        "socket", help="Path of the Unix domain socket to listen on",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="""Directory where parsed doc fragments and compiled templates
+        are stored.
+        """
+    )
+    parser.add_argument(
+        "--engine", choices=("ansible", "static"), default="ansible",
+        help="""Documentation extraction engine (default: ansible)."""
+    )
+    parser.add_argument(
+        "--markup-cache-size", type=non_negative_int, default=8192,
+        help="""Maximum number of converted markup strings that are kept in
+        memory for reuse (default: 8192).
+        """
+    )
+    parser.add_argument(
+        "--subtree-cache-size", type=non_negative_int, default=1024,
+        help="""Maximum number of rendered option and return value subtrees
+        that are kept in memory for reuse (default: 1024).
+        """
+    )
+    parser.add_argument(
+        "--yaml-backend", choices=("auto", "libyaml", "python"),
+        default="auto",
+        help="""YAML parser for the YAML that ansible does not parse
+        (default: auto).
+        """
+    )
+    parser.add_argument(
+        "--no-template-cache", dest="template_cache", action="store_false",
+        help="""Do not store compiled templates on disk."""
+    )
+    return parser
+
+
+def _render_module_docs(output_folder, module, templates, *args, **kwargs):
+    # Callers of the old cli.render_module_docs pass a single template and
+    # the extension of its documents.
+    from ansible_doc_extractor import render
+    if args and isinstance(args[0], str):
+        templates = [("", templates, args[0])]
+        args = args[1:]
+    elif "extension" in kwargs:
+        templates = [("", templates, kwargs.pop("extension"))]
+    return render.render_module_docs(
+        output_folder, module, templates, *args, **kwargs
+    )
+
+
+def __getattr__(name):
+    # Rendering functions used to live in this module. Dunder lookups, such
+    # as the import system checking for __path__, must not trigger the import.
+    if name == "render_module_docs":
+        return _render_module_docs
+    if not name.startswith("__"):
+        from ansible_doc_extractor import render
+        if hasattr(render, name):
+            return getattr(render, name)
+    raise AttributeError(
+        "module {!r} has no attribute {!r}".format(__name__, name)
+    )
+
+
+def check_conflicts(parser, args, option, others):
+    for name in others:
+        if getattr(args, name):
+            parser.error("--{} cannot be combined with --{}".format(
+                name.replace("_", "-"), option.replace("_", "-"),
+            ))
+
+
+def get_templates(parser, args):
+    """
+    Return the custom template of the single output and the (template,
+    extension) pairs of templates that render into outputs of their own
+    """
+    templates = [t for t in args.template if t[1] is not None]
+    custom = [t for t, extension in args.template if extension is None]
+    if len(custom) > 1 or custom and (templates or args.format):
+        parser.error(
+            "--template needs an extension, for example --template "
+            "{}:html, when several outputs are rendered".format(custom[0].name)
+        )
+
+    extensions = args.format + [extension for _, extension in templates]
+    for extension in extensions:
+        if extensions.count(extension) > 1:
+            parser.error(
+                "several outputs render into the {} folder".format(extension)
+            )
+    return (custom[0] if custom else None), templates
+
+
+def check_engine(render, engine):
+    if engine == "ansible" and not render.HAS_ANSIBLE:
         print(
             "Please install 'ansible' or 'ansible-base' or 'ansible-core'.",
             file=sys.stderr
         )
         sys.exit(1)
 
-    args = create_argument_parser().parse_args()
-    render_docs(args.output, args.module, args.template, args.markdown)
+
+def check_yaml_backend(parser, backend):
+    from ansible_doc_extractor import yamlbackend
+    if backend == "libyaml" and not yamlbackend.HAS_LIBYAML:
+        parser.error("--yaml-backend libyaml needs PyYAML built with libyaml")
+
+
+def main():
+    parser = create_argument_parser()
+    # Modules are optional with --collection, so plain parse_args would
+    # assign them an empty list as soon as an option follows the output.
+    if hasattr(parser, "parse_intermixed_args"):
+        args = parser.parse_intermixed_args()
+    else:  # Python < 3.7
+        args = parser.parse_args()
+    if args.merge_shards:
+        if args.module:
+            parser.error("--merge-shards does not take modules")
+        check_conflicts(
+            parser, args, "merge_shards",
+            [
+                "collection", "archive", "from_json", "check_references",
+                "shard", "shard_timings", "stream", "writer_threads",
+                "profile", "profile_json", "profile_trace", "watch",
+            ],
+        )
+    elif not args.module and args.collection is None:
+        parser.error("at least one module or --collection is required")
+    if args.collection is not None:
+        check_conflicts(parser, args, "collection", ["watch"])
+    if args.archive is not None:
+        check_conflicts(
+            parser, args, "archive",
+            ["watch", "skip_unchanged", "stream", "writer_threads"],
+        )
+    if args.dump_format is not None:
+        check_conflicts(
+            parser, args, "dump_" + args.dump_format,
+            [
+                "template", "format", "index", "index_template", "from_json",
+                "stream", "watch", "merge_shards",
+            ],
+        )
+    if args.from_json:
+        check_conflicts(
+            parser, args, "from_json",
+            ["collection", "check_references", "watch"],
+        )
+
+    custom_template, templates = get_templates(parser, args)
+    if args.format or templates:
+        check_conflicts(parser, args, "format", ["markdown", "watch"])
+    if args.index or args.index_template:
+        check_conflicts(parser, args, "index", ["watch"])
+    if args.check_references:
+        check_conflicts(parser, args, "check_references", ["watch"])
+    if args.writer_threads:
+        check_conflicts(parser, args, "writer_threads", ["stream", "watch"])
+    if args.shard is not None:
+        check_conflicts(parser, args, "shard", ["watch"])
+        if args.archive is not None and (args.index or args.index_template):
+            parser.error(
+                "--index cannot be combined with --shard and --archive"
+            )
+    elif args.shard_timings is not None:
+        parser.error("--shard-timings needs --shard")
+
+    from ansible_doc_extractor import render
+    engine = args.engine
+    if args.from_json:
+        engine = render.DUMP_ENGINE
+    check_engine(render, engine)
+    check_yaml_backend(parser, args.yaml_backend)
+
+    options = dict(
+        cache_dir=args.cache_dir,
+        engine=engine,
+        markup_cache_size=args.markup_cache_size,
+        subtree_cache_size=args.subtree_cache_size,
+        template_cache=args.template_cache,
+        skip_unchanged=args.skip_unchanged,
+        stream=args.stream,
+        yaml_backend=args.yaml_backend,
+    )
+    if args.merge_shards:
+        from ansible_doc_extractor import sharding
+        try:
+            render.merge_shards(
+                args.output, custom_template, args.markdown,
+                cache_dir=args.cache_dir,
+                engine=engine,
+                template_cache=args.template_cache,
+                skip_unchanged=args.skip_unchanged,
+                formats=args.format,
+                templates=templates,
+                index_pages=bool(args.index or args.index_template),
+                index_templates=args.index_template,
+            )
+        except sharding.ShardError as e:
+            print("error: {}".format(e), file=sys.stderr)
+            sys.exit(1)
+    elif args.watch:
+        from ansible_doc_extractor import watch
+        watch.watch_docs(
+            args.output, args.module, custom_template, args.markdown, **options
+        )
+    else:
+        from ansible_doc_extractor import collection, dump, sharding
+        try:
+            render.render_docs(
+                args.output, args.module, custom_template, args.markdown,
+                jobs=args.jobs, collection_root=args.collection,
+                archive_format=args.archive,
+                profile=bool(
+                    args.profile or args.profile_json or args.profile_trace
+                ),
+                profile_json=args.profile_json,
+                profile_trace=args.profile_trace,
+                dump_format=args.dump_format,
+                formats=args.format,
+                templates=templates,
+                index_pages=bool(args.index or args.index_template),
+                index_templates=args.index_template,
+                check_references=args.check_references,
+                writer_threads=args.writer_threads,
+                write_queue_size=args.write_queue_size,
+                shard=args.shard,
+                shard_timings=args.shard_timings,
+                **options
+            )
+        except (
+            collection.CollectionError, dump.DumpError, sharding.ShardError,
+        ) as e:
+            print("error: {}".format(e), file=sys.stderr)
+            sys.exit(1)
+
+
+def server_main():
+    parser = create_server_argument_parser()
+    args = parser.parse_args()
+
+    from ansible_doc_extractor import render, server
+    check_engine(render, args.engine)
+    check_yaml_backend(parser, args.yaml_backend)
+
+    server.serve(
+        args.socket,
+        cache_dir=args.cache_dir,
+        engine=args.engine,
+        markup_cache_size=args.markup_cache_size,
+        subtree_cache_size=args.subtree_cache_size,
+        template_cache=args.template_cache,
+        yaml_backend=args.yaml_backend,
+    )
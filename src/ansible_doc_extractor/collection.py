@@ -0,0 +1,106 @@
+import os
+import os.path
+
+from ansible_doc_extractor import yamlbackend
+
+
+# Plugin directories of a collection and the plugin types they contain.
+# Directories that hold code without documentation, such as action,
+# doc_fragments, and module_utils, are not listed.
+PLUGIN_TYPES = {
+    "become": "become",
+    "cache": "cache",
+    "callback": "callback",
+    "cliconf": "cliconf",
+    "connection": "connection",
+    "filter": "filter",
+    "httpapi": "httpapi",
+    "inventory": "inventory",
+    "lookup": "lookup",
+    "modules": "module",
+    "netconf": "netconf",
+    "shell": "shell",
+    "strategy": "strategy",
+    "test": "test",
+    "vars": "vars",
+}
+
+# Filter and test plugin files implement several plugins at once, so their
+# documentation lives in YAML files next to them.
+YAML_DOC_TYPES = ("filter", "test")
+
+PYTHON_EXTENSIONS = (".py",)
+
+YAML_EXTENSIONS = (".yml", ".yaml")
+
+
+class CollectionError(Exception):
+    pass
+
+
+def get_collection_name(root):
+    """
+    Return the namespace.name of the collection from its galaxy.yml file or,
+    when that is missing, from its location in an ansible_collections tree
+    """
+    galaxy = os.path.join(root, "galaxy.yml")
+    try:
+        with open(galaxy, "rb") as fd:
+            info = yamlbackend.safe_load(fd) or {}
+    except FileNotFoundError:
+        info = {}
+    if info.get("namespace") and info.get("name"):
+        return "{}.{}".format(info["namespace"], info["name"])
+
+    parent, name = os.path.split(os.path.abspath(root))
+    grandparent, namespace = os.path.split(parent)
+    if os.path.basename(grandparent) == "ansible_collections":
+        return "{}.{}".format(namespace, name)
+    return None
+
+
+def is_plugin_file(name, plugin_type):
+    if name.startswith(("_", ".")):
+        return False
+    if plugin_type in YAML_DOC_TYPES:
+        return name.endswith(YAML_EXTENSIONS)
+    return name.endswith(PYTHON_EXTENSIONS)
+
+
+def find_plugins(root):
+    """
+    Return a sorted list of (plugin type, path) pairs for all documented
+    plugins of the collection
+
+    Plugin directories are walked once with os.scandir, which returns file
+    types together with the names, so no file needs to be stat-ed
+    separately. Symbolic links are deprecated plugin aliases that document
+    the plugin they point to and are skipped.
+    """
+    plugins_dir = os.path.join(root, "plugins")
+    if not os.path.isdir(plugins_dir):
+        raise CollectionError(
+            "{} is not a collection: missing plugins directory".format(root)
+        )
+
+    plugins = []
+    pending = []
+    with os.scandir(plugins_dir) as entries:
+        for entry in entries:
+            plugin_type = PLUGIN_TYPES.get(entry.name)
+            if plugin_type is not None and entry.is_dir():
+                pending.append((plugin_type, entry.path))
+
+    while pending:
+        plugin_type, directory = pending.pop()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_symlink():
+                    continue
+                if entry.is_dir():
+                    if not entry.name.startswith(("_", ".")):
+                        pending.append((plugin_type, entry.path))
+                elif is_plugin_file(entry.name, plugin_type):
+                    plugins.append((plugin_type, entry.path))
+
+    return sorted(plugins)
@@ -0,0 +1,137 @@
+"""
+Machine-readable dumps of extracted documentation
+
+A dump contains the documentation exactly as templates get it, so rendering
+from a dump gives the same output as rendering right after extraction, but
+without ansible and without parsing the module and its doc fragments again.
+"""
+
+import datetime
+import json
+import os
+import os.path
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from ansible_doc_extractor import model
+
+# Bump this when the layout of the dumps changes.
+DUMP_FORMAT = 1
+
+FORMATS = ("json", "msgpack")
+
+
+class DumpError(Exception):
+    pass
+
+
+def _default(value):
+    if isinstance(value, model.Spec):
+        return dict(value)
+    # YAML turns unquoted dates into date objects, which templates render as
+    # their string representation.
+    if isinstance(value, datetime.date):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(
+        "Object of type {} cannot be dumped".format(type(value).__name__)
+    )
+
+
+def check_format(dump_format):
+    if dump_format not in FORMATS:
+        raise DumpError("Unsupported dump format {!r}".format(dump_format))
+    if dump_format == "msgpack" and msgpack is None:
+        raise DumpError(
+            "Please install 'msgpack' to use the msgpack dump format."
+        )
+
+
+def dumps(doc, dump_format="json"):
+    """
+    Return the documentation serialized in the dump format
+    """
+    data = dict(format=DUMP_FORMAT, doc=doc)
+    if dump_format == "msgpack":
+        return msgpack.packb(data, default=_default, use_bin_type=True)
+    return json.dumps(
+        data, default=_default, ensure_ascii=False,
+    ).encode("utf-8") + b"\n"
+
+
+def load(path):
+    """
+    Return the documentation from the dump file, prepared for the template
+    """
+    try:
+        with open(path, "rb") as fd:
+            raw = fd.read()
+    except OSError as e:
+        raise DumpError("Cannot read dump {}: {}".format(path, e.strerror))
+
+    try:
+        if path.endswith(".msgpack"):
+            check_format("msgpack")
+            data = msgpack.unpackb(raw, raw=False)
+        else:
+            data = json.loads(raw.decode("utf-8"))
+    except ValueError as e:
+        raise DumpError("Cannot read dump {}: {}".format(path, e))
+
+    if not isinstance(data, dict) or data.get("format") != DUMP_FORMAT:
+        raise DumpError(
+            "{} is not a documentation dump in format {}".format(
+                path, DUMP_FORMAT,
+            )
+        )
+
+    doc = data["doc"]
+    for key in "options", "returndocs":
+        if key in doc:
+            doc[key] = model.build_specs(doc[key])
+    return doc
+
+
+class Dumper:
+    """
+    Stand-in for a template that dumps the documentation instead of
+    rendering it
+    """
+
+    def __init__(self, dump_format):
+        check_format(dump_format)
+        self.dump_format = dump_format
+
+    def render(self, doc):
+        return dumps(doc, self.dump_format)
+
+
+def find_dumps(paths):
+    """
+    Return (subfolder, path) pairs for the dump files and the dumps in
+    directories, where subfolder is the location of a dump relative to the
+    directory that was passed in
+    """
+    extensions = tuple("." + f for f in FORMATS)
+    dumps = []
+    for path in paths:
+        if not os.path.isdir(path):
+            dumps.append(("", path))
+            continue
+
+        found = []
+        pending = [""]
+        while pending:
+            subfolder = pending.pop()
+            with os.scandir(os.path.join(path, subfolder)) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        pending.append(os.path.join(subfolder, entry.name))
+                    elif entry.name.endswith(extensions):
+                        found.append((subfolder, entry.path))
+        dumps.extend(sorted(found))
+    return dumps
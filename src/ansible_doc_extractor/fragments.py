@@ -0,0 +1,323 @@
+import copy
+import hashlib
+import os
+import os.path
+import pickle
+import tempfile
+from collections.abc import MutableMapping, MutableSequence, MutableSet
+
+from ansible_doc_extractor import profiling
+
+
+class FragmentError(Exception):
+    pass
+
+
+class FragmentCache:
+    """
+    Doc fragment loader that parses each doc fragment only once
+
+    Fragments are located and imported by the loader, which can be ansible's
+    fragment_loader or anything else with the same find_plugin and get
+    methods, and parsed by the load_yaml function. Parsed fragments are kept
+    in memory for the lifetime of the cache and, when the cache directory is
+    set, stored on disk for subsequent runs. Consumers always get a private
+    copy of the parsed fragment because merging fragments into the module
+    documentation modifies them.
+    """
+
+    def __init__(self, loader, load_yaml, directory=None, version=""):
+        self.loader = loader
+        self.load_yaml = load_yaml
+        self.directory = directory
+        self.version = version
+        self._fragments = {}
+        self._mtimes = {}
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, slug):
+        """
+        Return a (path, name, data) tuple for the fragment or None when the
+        fragment cannot be found.
+        """
+        if slug in self._fragments:
+            self.hits += 1
+        else:
+            self._fragments[slug] = self._load(slug)
+
+        fragment = self._fragments[slug]
+        if fragment is None:
+            return None
+        path, name, data = fragment
+        return path, name, copy.deepcopy(data)
+
+    def forget(self, paths):
+        """
+        Drop parsed fragments that come from any of the absolute paths
+        """
+        self._fragments = {
+            slug: fragment for slug, fragment in self._fragments.items()
+            if fragment is None or os.path.abspath(fragment[0]) not in paths
+        }
+        for path in paths:
+            self._mtimes.pop(path, None)
+
+    def stale_paths(self):
+        """
+        Return absolute paths of parsed fragments that changed since parsing
+        """
+        return {
+            path for path, mtime in self._mtimes.items()
+            if _get_mtime(path) != mtime
+        }
+
+    def _load(self, slug):
+        # Fragments can reference a variable other than DOCUMENTATION using
+        # the dot separator that collections also use. Try loading the whole
+        # slug as a fragment name first and fall back to splitting off the
+        # variable name if that fails.
+        fragment_name = slug.strip()
+        fragment_var = "DOCUMENTATION"
+        path = self.loader.find_plugin(fragment_name)
+        if path is None and "." in slug:
+            fragment_name, fragment_var = slug.rsplit(".", 1)
+            fragment_var = fragment_var.upper()
+            path = self.loader.find_plugin(fragment_name)
+        if path is None:
+            self.misses += 1
+            return None
+
+        self._mtimes[os.path.abspath(path)] = _get_mtime(path)
+        disk_path = self._get_disk_path(path, fragment_name, fragment_var)
+        fragment = self._load_from_disk(disk_path)
+        if fragment is not None:
+            # Cached fragments always belong to the file that was just
+            # found, even if an identical file was parsed first.
+            fragment = path, fragment[1], fragment[2]
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            fragment = self._parse(path, fragment_name, fragment_var)
+            if fragment is not None:
+                self._store_on_disk(disk_path, fragment)
+        return fragment
+
+    def _parse(self, path, fragment_name, fragment_var):
+        fragment_class = self.loader.get(fragment_name)
+        if fragment_class is None:
+            return None
+
+        fragment_yaml = getattr(fragment_class, fragment_var, None)
+        if fragment_yaml is None:
+            if fragment_var != "DOCUMENTATION":
+                return None
+            fragment_yaml = "{}"
+
+        data = self.load_yaml(fragment_yaml, path)
+        name = getattr(fragment_class, "ansible_name", fragment_name)
+        return path, name, data
+
+    def _get_disk_path(self, path, fragment_name, fragment_var):
+        # Identical files in different places, such as two checkouts of a
+        # collection, can have different names and feed different build
+        # cache entries, so they are stored separately.
+        if self.directory is None:
+            return None
+        digest = hashlib.sha256()
+        for part in (
+            self.version, os.path.abspath(path), fragment_name, fragment_var,
+        ):
+            digest.update(part.encode("utf-8") + b"\0")
+        with open(path, "rb") as fd:
+            digest.update(fd.read())
+        return os.path.join(self.directory, digest.hexdigest() + ".pickle")
+
+    def _load_from_disk(self, disk_path):
+        if disk_path is None:
+            return None
+        try:
+            with open(disk_path, "rb") as fd:
+                return pickle.load(fd)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def _store_on_disk(self, disk_path, fragment):
+        if disk_path is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        with os.fdopen(fd, "wb") as tmp:
+            pickle.dump(fragment, tmp)
+        os.replace(tmp_path, disk_path)
+
+
+def _get_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def merge_fragment(target, source):
+    # Same as ansible's plugin_docs.merge_fragment, including the order of
+    # the merged keys, which shows up in the rendered documentation.
+    for key, value in source.items():
+        if key in target:
+            if isinstance(target[key], MutableMapping):
+                value.update(target[key])
+            elif isinstance(target[key], MutableSet):
+                value.add(target[key])
+            elif isinstance(target[key], MutableSequence):
+                value = sorted(frozenset(value + target[key]))
+            else:
+                raise FragmentError(
+                    "Attempt to extend a documentation fragment, invalid "
+                    "type for {}".format(key)
+                )
+        target[key] = value
+
+
+def add_collection_to_versions_and_dates(fragment, collection_name, is_module):
+    # Port of ansible's plugin_docs.add_collection_to_versions_and_dates for
+    # DOCUMENTATION fragments that also works without ansible installed.
+    def add(data, collection_name_field):
+        data.setdefault(collection_name_field, collection_name)
+
+    def process_deprecation(deprecation, top_level=False):
+        if not isinstance(deprecation, MutableMapping):
+            return
+        field = "removed_from_collection" if top_level else "collection_name"
+        if (is_module or top_level) and "removed_in" in deprecation:
+            add(deprecation, field)
+        if "removed_at_date" in deprecation:
+            add(deprecation, field)
+        if not (is_module or top_level) and "version" in deprecation:
+            add(deprecation, field)
+
+    def process_option_specifiers(specifiers):
+        for specifier in specifiers:
+            if not isinstance(specifier, MutableMapping):
+                continue
+            if "version_added" in specifier:
+                add(specifier, "version_added_collection")
+            process_deprecation(specifier.get("deprecated"))
+
+    def process_options(options):
+        for option in options.values():
+            if not isinstance(option, MutableMapping):
+                continue
+            if "version_added" in option:
+                add(option, "version_added_collection")
+            if not is_module:
+                for key in "env", "ini", "vars":
+                    if isinstance(option.get(key), list):
+                        process_option_specifiers(option[key])
+                process_deprecation(option.get("deprecated"))
+            if isinstance(option.get("suboptions"), MutableMapping):
+                process_options(option["suboptions"])
+
+    if not fragment:
+        return
+    if "version_added" in fragment:
+        add(fragment, "version_added_collection")
+    process_deprecation(fragment.get("deprecated"), top_level=True)
+    if isinstance(fragment.get("options"), MutableMapping):
+        process_options(fragment["options"])
+    if isinstance(fragment.get("attributes"), MutableMapping):
+        for attribute in fragment["attributes"].values():
+            if isinstance(attribute, MutableMapping) and "version_added" in attribute:
+                add(attribute, "version_added_collection")
+
+
+def add_fragments(doc, filename, fragment_cache, is_module=False):
+    """
+    Merge doc fragments into module documentation
+
+    This is ansible's plugin_docs.add_fragments that takes pre-parsed doc
+    fragments from the fragment cache. Returns paths of the merged fragments.
+    """
+    fragments = doc.pop("extends_documentation_fragment", [])
+    if isinstance(fragments, str):
+        fragments = fragments.split(",")
+
+    paths = []
+    unknown_fragments = []
+    for fragment_slug in fragments:
+        resolved = fragment_cache.get(fragment_slug)
+        if resolved is None:
+            unknown_fragments.append(fragment_slug)
+            continue
+
+        path, real_fragment_name, fragment = resolved
+        paths.append(path)
+
+        real_collection_name = ""
+        if "." in real_fragment_name:
+            real_collection_name = ".".join(real_fragment_name.split(".")[0:2])
+        add_collection_to_versions_and_dates(
+            fragment, real_collection_name, is_module,
+        )
+
+        for key in "notes", "seealso":
+            if key in fragment:
+                values = fragment.pop(key)
+                if values:
+                    doc.setdefault(key, []).extend(values)
+
+        if "options" not in fragment and "attributes" not in fragment:
+            raise FragmentError(
+                "missing options or attributes in fragment ({}), possibly "
+                "misformatted?: {}".format(fragment_slug, filename)
+            )
+
+        for doc_key in "options", "attributes":
+            if doc_key not in fragment:
+                continue
+            if doc_key not in doc:
+                doc[doc_key] = fragment.pop(doc_key)
+                continue
+            try:
+                merge_fragment(doc[doc_key], fragment.pop(doc_key))
+            except FragmentError as e:
+                raise FragmentError("{} {} ({}) of unknown type: {}".format(
+                    e, doc_key, fragment_slug, filename,
+                ))
+
+        try:
+            merge_fragment(doc, fragment)
+        except FragmentError as e:
+            raise FragmentError("{} ({}) of unknown type: {}".format(
+                e, fragment_slug, filename,
+            ))
+
+    if unknown_fragments:
+        raise FragmentError("unknown doc_fragment(s) in file {}: {}".format(
+            filename, ", ".join(unknown_fragments),
+        ))
+
+    return paths
+
+
+def get_docstring(filename, fragment_cache):
+    """
+    Read plugin documentation using ansible and merge the doc fragments it
+    extends
+
+    Returns the same values as ansible's plugin_docs.get_docstring and the
+    list of paths of the merged doc fragments.
+    """
+    from ansible.parsing.plugin_docs import read_docstring
+
+    data = read_docstring(filename)
+
+    fragments = []
+    if data.get("doc"):
+        with profiling.stage("fragments"):
+            fragments = add_fragments(data["doc"], filename, fragment_cache)
+
+    return (
+        data["doc"], data["plainexamples"], data["returndocs"],
+        data["metadata"], fragments,
+    )
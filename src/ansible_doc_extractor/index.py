@@ -0,0 +1,85 @@
+"""
+Index pages of the rendered plugins
+
+Index pages are rendered from short summaries that are collected while the
+modules are rendered, so the rendered documents are never read again.
+"""
+
+import collections
+import os.path
+
+
+def get_summary(doc):
+    """
+    Return the part of the documentation that index pages need
+    """
+    deprecated = doc.get("deprecated")
+    if isinstance(deprecated, dict):
+        # Dates in YAML become date objects, which the build cache cannot
+        # store.
+        deprecated = {key: str(value) for key, value in deprecated.items()}
+    elif deprecated:
+        deprecated = {}
+    else:
+        deprecated = None
+
+    return dict(
+        name=doc["module"],
+        plugin_type=doc.get("plugin_type", "module"),
+        collection=doc.get("collection"),
+        short_description=doc.get("short_description") or "",
+        deprecated=deprecated,
+    )
+
+
+def _sort_key(plugin):
+    # Modules come first, other plugin types follow in alphabetical order.
+    return (
+        plugin["plugin_type"] != "module", plugin["plugin_type"],
+        plugin["name"],
+    )
+
+
+class Index:
+    """
+    Summaries of rendered plugins and the paths of their documents
+    """
+
+    def __init__(self):
+        self.entries = []
+
+    def add(self, summary, outputs):
+        """
+        Add the summary of a plugin and the paths of its documents, one for
+        each output
+        """
+        if summary is not None:
+            self.entries.append((summary, outputs))
+
+    def get_context(self, output, folder, extension):
+        """
+        Return the template context of the index page in the folder for
+        the output with the given position and extension
+        """
+        start = os.path.abspath(folder or ".")
+        plugins = []
+        for summary, outputs in self.entries:
+            path = os.path.relpath(os.path.abspath(outputs[output]), start)
+            path = path.replace(os.sep, "/")
+            plugins.append(dict(
+                summary, path=path, docname=os.path.splitext(path)[0],
+            ))
+        plugins.sort(key=_sort_key)
+
+        plugin_types = collections.OrderedDict()
+        for plugin in plugins:
+            plugin_types.setdefault(plugin["plugin_type"], []).append(plugin)
+
+        return dict(
+            collection=next(
+                (p["collection"] for p in plugins if p["collection"]), None,
+            ),
+            extension=extension,
+            plugins=plugins,
+            plugin_types=plugin_types,
+        )
@@ -0,0 +1,188 @@
+"""
+Compact model of option and return value specifications
+
+Specs behave like the read-only dictionaries that templates used to get, so
+spec.type, spec["type"], spec.get("type"), and spec.items() all keep working,
+but common fields are stored in slots. Jinja2 looks attributes up before
+items, so reading a slot avoids the failed attribute lookup that every
+spec.field access on a dictionary costs.
+"""
+
+import hashlib
+from collections.abc import Mapping
+
+# Nested specs are stored under these keys.
+CHILD_KEYS = ("suboptions", "contains")
+
+# O() and RV() markup without a plugin name refers to the documented plugin.
+PLUGIN_MARKUP = ("O(", "RV(")
+
+
+class Spec(Mapping):
+    """
+    Option or return value specification
+
+    Keys without a slot are kept in a dictionary. The order of the keys in
+    the source is preserved, so iterating over a spec gives the same result
+    as iterating over the source dictionary.
+    """
+
+    FIELDS = (
+        "description", "type", "required", "default", "choices", "elements",
+        "aliases", "version_added", "returned", "sample",
+    ) + CHILD_KEYS
+
+    __slots__ = FIELDS + ("_keys", "_extra", "_structure")
+
+    def __init__(self, data):
+        self._keys = tuple(data)
+        self._extra = None
+        self._structure = None
+        for key, value in data.items():
+            if key in _FIELD_SET:
+                setattr(self, key, value)
+            else:
+                if self._extra is None:
+                    self._extra = {}
+                self._extra[key] = value
+
+    def __getitem__(self, key):
+        if key in _FIELD_SET:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key)
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+_FIELD_SET = frozenset(Spec.FIELDS)
+
+
+def ensure_list(value):
+    if isinstance(value, list):
+        return value
+    return [value]
+
+
+def build_specs(data):
+    """
+    Return a dictionary of specs for the name to definition mapping
+
+    Descriptions are turned into lists. Nested definitions are processed
+    with an explicit stack instead of recursion, so the depth of the nesting
+    is not limited. Definitions that are not dictionaries are kept as they
+    are.
+    """
+    specs = {}
+    pending = [(data, specs)]
+    while pending:
+        definitions, target = pending.pop()
+        for name, definition in definitions.items():
+            if not isinstance(definition, dict):
+                target[name] = definition
+                continue
+
+            spec = target[name] = Spec(definition)
+            if "description" in definition:
+                spec.description = ensure_list(definition["description"])
+            for key in CHILD_KEYS:
+                children = definition.get(key)
+                if isinstance(children, dict):
+                    nested = {}
+                    setattr(spec, key, nested)
+                    pending.append((children, nested))
+    return specs
+
+
+def _describe_items(items):
+    # Nested specs are represented by their digests, which are known by now.
+    parts = []
+    uses_plugin = False
+    for key, value in items:
+        if isinstance(value, Spec):
+            value, spec_uses_plugin = value._structure
+            uses_plugin = uses_plugin or spec_uses_plugin
+        elif key in CHILD_KEYS and isinstance(value, dict):
+            value, children_use_plugin = _describe_items(value.items())
+            uses_plugin = uses_plugin or children_use_plugin
+        parts.append((key, value))
+    text = repr(parts)
+    uses_plugin = uses_plugin or any(markup in text for markup in PLUGIN_MARKUP)
+    return hashlib.sha256(text.encode("utf-8")).digest(), uses_plugin
+
+
+def fingerprint(specs):
+    """
+    Return a key that equal name to spec mappings share and that different
+    mappings rarely do, which is much cheaper than describe()
+    """
+    parts = []
+    for name, spec in specs.items():
+        description = getattr(spec, "description", None)
+        if isinstance(description, list) and description:
+            description = description[0]
+        if not isinstance(description, str):
+            description = None
+        parts.append((name, description))
+    return tuple(parts)
+
+
+def describe(specs):
+    """
+    Return a digest of the name to spec mapping, which is equal for mappings
+    with equal content, and whether their markup refers to the documented
+    plugin
+
+    Digests of nested specs are computed once and kept in the specs, and
+    nested specs are processed with an explicit stack like in build_specs.
+    """
+    pending = [spec for spec in specs.values() if isinstance(spec, Spec)]
+    while pending:
+        spec = pending[-1]
+        if spec._structure is not None:
+            pending.pop()
+            continue
+        children = [
+            child for key in CHILD_KEYS
+            if isinstance(getattr(spec, key, None), dict)
+            for child in getattr(spec, key).values()
+            if isinstance(child, Spec) and child._structure is None
+        ]
+        if children:
+            pending.extend(children)
+            continue
+        pending.pop()
+        spec._structure = _describe_items((key, spec[key]) for key in spec)
+    return _describe_items(specs.items())
+
+
+def represent_spec(dumper, spec):
+    return dumper.represent_dict(spec)
+
+
+def register_yaml_representer(dumper):
+    dumper.add_multi_representer(Spec, represent_spec)
+
+
+def json_default(value):
+    if isinstance(value, Spec):
+        return dict(value)
+    raise TypeError(
+        "Object of type {} is not JSON serializable".format(
+            type(value).__name__,
+        )
+    )
@@ -0,0 +1,248 @@
+import contextlib
+import hashlib
+import locale
+import os
+import os.path
+import queue
+import stat
+import tempfile
+import threading
+import time
+
+
+# Streamed documents are encoded and written in pieces of about this many
+# characters.
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+_file_mode = None
+
+_file_mode_lock = threading.Lock()
+
+
+def _get_umask():
+    # Linux reports the umask without changing it. Elsewhere, it is briefly
+    # set to zero, which other threads of the process could observe.
+    try:
+        with open("/proc/self/status") as fd:
+            for line in fd:
+                if line.startswith("Umask:"):
+                    return int(line.split()[1], 8)
+    except (OSError, ValueError, IndexError):
+        pass
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+def get_file_mode():
+    """
+    Return the permissions that open() gives new files
+
+    The umask is read once, on first use instead of on import, so importing
+    this module in a threaded host does not touch it.
+    """
+    global _file_mode
+    with _file_mode_lock:
+        if _file_mode is None:
+            _file_mode = 0o666 & ~_get_umask()
+    return _file_mode
+
+
+def _get_replace_mode(path):
+    # Temporary files are created with 0600 permissions. Output files get the
+    # same permissions that open() would give them, which keeps the mode of
+    # files that already exist.
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        return get_file_mode()
+
+
+def encode(text):
+    # Same encoding and newline handling as files opened with open(path, "w")
+    # for text. Documentation dumps are already encoded.
+    if isinstance(text, bytes):
+        return text
+    if os.linesep != "\n":
+        text = text.replace("\n", os.linesep)
+    return text.encode(locale.getpreferredencoding(False))
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fd:
+        for chunk in iter(lambda: fd.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def has_content(path, size, digest):
+    try:
+        if os.stat(path).st_size != size:
+            return False
+        return hash_file(path) == digest
+    except OSError:
+        return False
+
+
+def is_unchanged(path, data):
+    return has_content(path, len(data), hashlib.sha256(data).digest())
+
+
+@contextlib.contextmanager
+def atomic_open(path):
+    """
+    Open a temporary binary file that replaces the file at path when the
+    block completes and is removed if the block fails
+    """
+    directory, name = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory or ".", prefix=".{}.".format(name), suffix=".tmp",
+    )
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            yield tmp
+            os.chmod(tmp_path, _get_replace_mode(path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class _Unchanged(Exception):
+    pass
+
+
+def write_chunks(path, chunks, skip_unchanged=False,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Write text chunks to the file atomically as they are generated and
+    return True if the file was written
+
+    Chunks are collected until they add up to chunk_size characters and
+    then encoded and written together, so the whole text is never in memory
+    and small chunks do not cost a write each. With skip_unchanged set, the
+    temporary file is dropped if the file already has the same content.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with atomic_open(path) as fd:
+            pending = []
+            pending_size = 0
+            for chunk in chunks:
+                pending.append(chunk)
+                pending_size += len(chunk)
+                if pending_size < chunk_size:
+                    continue
+                data = encode("".join(pending))
+                digest.update(data)
+                size += len(data)
+                fd.write(data)
+                pending = []
+                pending_size = 0
+
+            data = encode("".join(pending))
+            digest.update(data)
+            size += len(data)
+            fd.write(data)
+            if skip_unchanged and has_content(path, size, digest.digest()):
+                raise _Unchanged()
+    except _Unchanged:
+        return False
+    return True
+
+
+def write_file(path, text, skip_unchanged=False):
+    """
+    Write text to the file atomically and return True if the file was written
+
+    Readers never see a partially written file because the content is written
+    to a temporary file that then replaces the destination. With
+    skip_unchanged set, files that already have the same content are left
+    alone, which keeps their modification times.
+    """
+    data = encode(text)
+    if skip_unchanged and is_unchanged(path, data):
+        return False
+
+    with atomic_open(path) as fd:
+        fd.write(data)
+    return True
+
+
+class BackgroundWriter:
+    """
+    Thread pool that writes files while the next documents are rendered
+
+    Files wait in a bounded queue, so a slow disk makes rendering wait
+    instead of letting rendered documents pile up in memory. The time spent
+    waiting for room in the queue is the write stall time.
+    """
+
+    def __init__(self, threads=2, queue_size=64, skip_unchanged=False):
+        self.skip_unchanged = skip_unchanged
+        self.written = 0
+        self.unchanged = 0
+        self.high_water_mark = 0
+        self.stall_time = 0.0
+        self._queue = queue.Queue(queue_size)
+        self._lock = threading.Lock()
+        self._error = None
+        self._threads = [
+            threading.Thread(target=self._run, daemon=True)
+            for _ in range(threads)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def write(self, files, done=None):
+        """
+        Queue the (path, data) files for writing and call done once they
+        are all written
+        """
+        if self._error is not None:
+            raise self._error
+        try:
+            self._queue.put_nowait((files, done))
+        except queue.Full:
+            start = time.perf_counter()
+            self._queue.put((files, done))
+            self.stall_time += time.perf_counter() - start
+        self.high_water_mark = max(self.high_water_mark, self._queue.qsize())
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            files, done = job
+            try:
+                written = [
+                    write_file(path, data, self.skip_unchanged)
+                    for path, data in files
+                ]
+                with self._lock:
+                    self.written += sum(written)
+                    self.unchanged += len(written) - sum(written)
+                if done is not None:
+                    done()
+            except BaseException as e:
+                with self._lock:
+                    if self._error is None:
+                        self._error = e
+
+    def close(self):
+        """
+        Wait until all queued files are written and raise the first error
+        that happened while writing them
+        """
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        if self._error is not None:
+            raise self._error
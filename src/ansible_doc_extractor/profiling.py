@@ -0,0 +1,233 @@
+import collections
+import json
+import os
+import time
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class NullProfiler:
+    """
+    Profiler that records nothing, used when profiling is disabled
+    """
+
+    def stage(self, name, trace=True):
+        return _NULL_STAGE
+
+    def start_module(self, module):
+        pass
+
+    def finish_module(self):
+        return None
+
+
+class _Stage:
+    def __init__(self, profiler, name, trace):
+        self.profiler = profiler
+        self.name = name
+        self.trace = trace
+
+    def __enter__(self):
+        self.profiler._push(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler._pop(self)
+        return False
+
+
+class Profiler:
+    """
+    Wall and CPU time of rendering stages of each module
+
+    Stage times are exclusive: time spent in a nested stage, such as markup
+    conversion while the template is rendered, is only counted once.
+    Stages with trace set also become trace events, which would be too many
+    for stages that run hundreds of times per module.
+    """
+
+    def __init__(self):
+        self._module = None
+
+    def stage(self, name, trace=True):
+        return _Stage(self, name, trace)
+
+    def start_module(self, module):
+        self._module = module
+        self._stages = collections.defaultdict(lambda: [0.0, 0.0])
+        self._events = []
+        self._stack = []
+        self._start = time.perf_counter(), time.process_time()
+
+    def _push(self, stage):
+        if self._module is None:
+            return
+        stage.start = time.perf_counter(), time.process_time()
+        stage.children = [0.0, 0.0]
+        self._stack.append(stage)
+
+    def _pop(self, stage):
+        if not self._stack or self._stack[-1] is not stage:
+            return
+        self._stack.pop()
+        wall = time.perf_counter() - stage.start[0]
+        cpu = time.process_time() - stage.start[1]
+
+        totals = self._stages[stage.name]
+        totals[0] += wall - stage.children[0]
+        totals[1] += cpu - stage.children[1]
+        if self._stack:
+            self._stack[-1].children[0] += wall
+            self._stack[-1].children[1] += cpu
+        if stage.trace:
+            self._events.append(_trace_event(stage.name, stage.start[0], wall))
+
+    def finish_module(self):
+        """
+        Return the profile of the module rendered since start_module
+        """
+        if self._module is None:
+            return None
+        wall = time.perf_counter() - self._start[0]
+        cpu = time.process_time() - self._start[1]
+        stages = dict(self._stages)
+        stages["other"] = [
+            wall - sum(s[0] for s in stages.values()),
+            cpu - sum(s[1] for s in stages.values()),
+        ]
+        events = self._events
+        events.append(_trace_event(
+            os.path.basename(self._module), self._start[0], wall,
+            dict(module=self._module),
+        ))
+        self._module = None
+        return dict(
+            wall=wall, cpu=cpu, stages=stages, events=events, pid=os.getpid(),
+        )
+
+
+def _trace_event(name, start, duration, args=None):
+    event = dict(name=name, ph="X", ts=start * 1e6, dur=duration * 1e6)
+    if args:
+        event["args"] = args
+    return event
+
+
+_profiler = NullProfiler()
+
+
+def enable():
+    global _profiler
+    if isinstance(_profiler, NullProfiler):
+        _profiler = Profiler()
+
+
+def get_profiler():
+    return _profiler
+
+
+def stage(name, trace=True):
+    return _profiler.stage(name, trace)
+
+
+class Report:
+    """
+    Profiles of all rendered modules, collected in the main process
+    """
+
+    def __init__(self):
+        self.modules = {}
+        self.events = []
+        self._start = time.perf_counter()
+        self.wall = 0.0
+
+    def add(self, module, profile):
+        if profile is None:
+            return
+        self.modules[module] = dict(
+            wall=profile["wall"], cpu=profile["cpu"], stages=profile["stages"],
+        )
+        for event in profile["events"]:
+            self.events.append(dict(event, pid=profile["pid"], tid=0))
+
+    def finish(self):
+        self.wall = time.perf_counter() - self._start
+
+    def stages(self):
+        totals = collections.defaultdict(lambda: [0.0, 0.0])
+        for profile in self.modules.values():
+            for name, (wall, cpu) in profile["stages"].items():
+                totals[name][0] += wall
+                totals[name][1] += cpu
+        return sorted(totals.items(), key=lambda item: -item[1][0])
+
+    def slowest_modules(self, count):
+        return sorted(
+            self.modules.items(), key=lambda item: -item[1]["wall"],
+        )[:count]
+
+    def print_summary(self, count=10, file=None):
+        modules_wall = sum(p["wall"] for p in self.modules.values())
+        modules_cpu = sum(p["cpu"] for p in self.modules.values())
+        print("Profile: {} modules in {:.3f}s ({:.3f}s wall, {:.3f}s CPU "
+              "spent rendering modules)".format(
+                  len(self.modules), self.wall, modules_wall, modules_cpu,
+              ), file=file)
+        if not self.modules:
+            return
+
+        print("  {:<12} {:>10} {:>10} {:>7}".format(
+            "stage", "wall s", "CPU s", "share",
+        ), file=file)
+        for name, (wall, cpu) in self.stages():
+            print("  {:<12} {:>10.3f} {:>10.3f} {:>6.1%}".format(
+                name, wall, cpu, wall / modules_wall if modules_wall else 0,
+            ), file=file)
+
+        print("  Slowest modules:", file=file)
+        for module, profile in self.slowest_modules(count):
+            print("  {:>10.3f}s  {}".format(profile["wall"], module), file=file)
+
+    def to_json(self):
+        return dict(
+            wall=self.wall,
+            stages={
+                name: dict(wall=wall, cpu=cpu)
+                for name, (wall, cpu) in self.stages()
+            },
+            modules={
+                module: dict(
+                    wall=profile["wall"],
+                    cpu=profile["cpu"],
+                    stages={
+                        name: dict(wall=wall, cpu=cpu)
+                        for name, (wall, cpu) in profile["stages"].items()
+                    },
+                )
+                for module, profile in self.modules.items()
+            },
+        )
+
+    def to_trace(self):
+        # Chrome trace event format, which chrome://tracing, Perfetto, and
+        # speedscope display as a flame chart per process.
+        start = min((e["ts"] for e in self.events), default=0)
+        return dict(
+            traceEvents=[dict(e, ts=e["ts"] - start) for e in self.events],
+            displayTimeUnit="ms",
+        )
+
+    def save(self, json_path=None, trace_path=None):
+        for path, data in (json_path, self.to_json), (trace_path, self.to_trace):
+            if path is not None:
+                with open(path, "w") as fd:
+                    json.dump(data(), fd)
@@ -0,0 +1,181 @@
+"""
+Cross-references between the plugins of a run
+
+All plugins that are rendered are indexed by their FQCN and type before
+rendering starts. References from seealso entries and from M() and P()
+markup are then checked against the index with a set lookup each.
+References into collections that are not rendered cannot be checked and are
+ignored.
+"""
+
+import os.path
+import re
+from collections.abc import Mapping
+
+from ansible_doc_extractor import collection
+
+# M(fqcn) and P(fqcn#type) markup
+REFERENCE_RE = re.compile(r"\b(?:M\(([^)]+)\)|P\(([^)#]+)#([^)]+)\))")
+
+
+def get_collection(fqcn):
+    parts = fqcn.split(".")
+    if len(parts) < 3:
+        return None
+    return ".".join(parts[:2])
+
+
+def find_plugin_location(path):
+    """
+    Return the root of the collection that contains the plugin file, the
+    plugin type, and the subfolders of the plugin type folder that contain
+    the file, or None if the file is not in a collection
+    """
+    folders = []
+    folder = os.path.dirname(os.path.abspath(path))
+    while True:
+        parent, name = os.path.split(folder)
+        if os.path.basename(parent) == "plugins":
+            plugin_type = collection.PLUGIN_TYPES.get(name)
+            if plugin_type is None:
+                return None
+            return os.path.dirname(parent), plugin_type, folders[::-1]
+        if parent == folder:
+            return None
+        folders.append(name)
+        folder = parent
+
+
+class PluginIndex:
+    """
+    FQCNs and types of the plugins of a run
+    """
+
+    def __init__(self):
+        self.plugins = set()
+        self.collections = set()
+
+    def add(self, fqcn, plugin_type):
+        self.plugins.add((fqcn, plugin_type))
+        self.collections.add(get_collection(fqcn))
+
+    def add_file(self, path, plugin_type=None, collection_name=None):
+        """
+        Add the plugin in the file, whose type and collection are looked up
+        from its location when not known
+        """
+        location = find_plugin_location(path)
+        folders = []
+        if location is not None:
+            root, found_type, folders = location
+            plugin_type = plugin_type or found_type
+            if collection_name is None:
+                collection_name = collection.get_collection_name(root)
+        if collection_name is None:
+            return
+
+        name = os.path.splitext(os.path.basename(path))[0]
+        plugin_type = plugin_type or "module"
+        self.add("{}.{}".format(collection_name, name), plugin_type)
+        # Plugins in subfolders can also be referenced with the subfolders
+        # in their names.
+        if folders:
+            self.add(
+                "{}.{}".format(collection_name, ".".join(folders + [name])),
+                plugin_type,
+            )
+
+    def is_broken(self, fqcn, plugin_type):
+        """
+        Return True if the plugin is not in the index but would be if it
+        existed
+        """
+        if get_collection(fqcn) not in self.collections:
+            return False
+        return (fqcn, plugin_type) not in self.plugins
+
+
+def build_plugin_index(tasks):
+    """
+    Return the index of the plugins of the (output folder, module, plugin
+    type, collection name) tasks
+    """
+    plugin_index = PluginIndex()
+    for _, path, plugin_type, collection_name in tasks:
+        plugin_index.add_file(path, plugin_type, collection_name)
+    return plugin_index
+
+
+def _strings(data):
+    pending = [data]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, str):
+            yield value
+        elif isinstance(value, list):
+            pending.extend(value)
+        elif isinstance(value, dict):
+            pending.extend(value.values())
+        elif isinstance(value, Mapping):
+            pending.extend(value[key] for key in value)
+
+
+def find_references(doc):
+    """
+    Return the sorted [text, FQCN, plugin type] references to plugins in
+    the documentation
+    """
+    references = set()
+    for item in doc.get("seealso") or ():
+        if not isinstance(item, Mapping):
+            continue
+        if "module" in item:
+            references.add((
+                "seealso module {}".format(item["module"]), item["module"],
+                "module",
+            ))
+        elif "plugin" in item and "plugin_type" in item:
+            references.add((
+                "seealso {} plugin {}".format(
+                    item["plugin_type"], item["plugin"],
+                ), item["plugin"], item["plugin_type"],
+            ))
+
+    # Examples are code, which does not contain markup.
+    texts = [value for key, value in doc.items() if key != "examples"]
+    for text in _strings(texts):
+        if "M(" not in text and "P(" not in text:
+            continue
+        for match in REFERENCE_RE.finditer(text):
+            module, plugin, plugin_type = match.groups()
+            if module is not None:
+                references.add((match.group(0), module.strip(), "module"))
+            else:
+                references.add(
+                    (match.group(0), plugin.strip(), plugin_type.strip()),
+                )
+    return sorted(list(reference) for reference in references)
+
+
+class ReferenceChecker:
+    """
+    Broken references of the rendered modules
+    """
+
+    def __init__(self, plugin_index):
+        self.plugin_index = plugin_index
+        self.checked = 0
+        self.broken = []
+
+    def check(self, module, references):
+        for text, fqcn, plugin_type in references:
+            self.checked += 1
+            if self.plugin_index.is_broken(fqcn, plugin_type):
+                self.broken.append((module, text))
+
+    def print_report(self, file=None):
+        for module, text in self.broken:
+            print("Broken reference in {}: {}".format(module, text), file=file)
+        print("References: {} checked, {} broken".format(
+            self.checked, len(self.broken),
+        ), file=file)
@@ -0,0 +1,1128 @@
+import collections
+import functools
+import importlib.util
+import json
+import multiprocessing
+import os
+import os.path
+import sys
+
+from jinja2 import (
+    ChoiceLoader, DictLoader, Environment, FileSystemBytecodeCache,
+    PackageLoader,
+)
+from jinja2.utils import pass_context
+
+from antsibull_docs_parser import dom
+from antsibull_docs_parser.parser import parse, Context
+from antsibull_docs_parser.rst import to_rst_plain
+from antsibull_docs_parser.md import to_md
+
+import yaml
+
+from ansible_doc_extractor import (
+    archive, cache, collection, dump, fragments, index, model, output,
+    profiling, references, sharding, static, yamlbackend,
+)
+from ansible_doc_extractor.model import ensure_list
+
+# Ansible is only imported by the ansible engine. The static engine and
+# rendering from dumps work without it.
+HAS_ANSIBLE = importlib.util.find_spec("ansible") is not None
+
+# Documentation can also be read from dumps, which are not extracted.
+DUMP_ENGINE = "dump"
+
+
+_supported_templates = ["rst", "md"]
+
+ENGINES = ("ansible", "static")
+
+DEFAULT_MARKUP_CACHE_SIZE = 8192
+
+DEFAULT_SUBTREE_CACHE_SIZE = 1024
+
+DEFAULT_WRITE_QUEUE_SIZE = 64
+
+# Long running processes, such as the render server and library users, keep
+# this many compiled templates.
+MAX_TEMPLATES = 16
+
+# Pool workers render at most this many modules per process ahead of the
+# consumer of the results, so a slow writer or archive reader pauses
+# rendering instead of letting rendered documents pile up in memory.
+TASKS_AHEAD_PER_JOB = 2
+
+
+def get_context(j2_context):
+    params = {}
+    plugin_collection = j2_context.get('collection')
+    plugin_name = j2_context.get('module')
+    plugin_type = j2_context.get('plugin_type')
+    if plugin_collection is not None and plugin_name is not None and plugin_type is not None:
+        params['current_plugin'] = dom.PluginIdentifier(fqcn=f"{plugin_collection}.{plugin_name}", type=plugin_type)
+    return Context(**params)
+
+
+_EMPTY_CONTEXT = Context()
+
+_markup_converters = {
+    "rst": to_rst_plain,
+    "md": to_md,
+}
+
+
+def _convert_markup(text, context, output_format):
+    return _markup_converters[output_format](parse(text, context))
+
+
+# The same text is converted many times, especially when it comes from doc
+# fragments, so conversion results are memoized. The key includes the parsing
+# context because the current plugin affects how O() and RV() references are
+# rendered. Text without them is parsed without a current plugin, so that it
+# is shared by all plugins.
+_cached_convert_markup = functools.lru_cache(DEFAULT_MARKUP_CACHE_SIZE)(
+    _convert_markup
+)
+
+
+def configure_markup_cache(size):
+    global _cached_convert_markup
+    _cached_convert_markup = functools.lru_cache(size)(_convert_markup)
+
+
+def markup_cache_info():
+    return _cached_convert_markup.cache_info()
+
+
+def convert_markup(j2_context, text, output_format):
+    with profiling.stage("markup", trace=False):
+        if isinstance(text, str):
+            context = _EMPTY_CONTEXT
+            if any(markup in text for markup in model.PLUGIN_MARKUP):
+                context = get_context(j2_context)
+            return _cached_convert_markup(text, context, output_format)
+        return _convert_markup(text, get_context(j2_context), output_format)
+
+
+@pass_context
+def rst_ify(j2_context, text):
+    return convert_markup(j2_context, text, "rst")
+
+
+@pass_context
+def md_ify(j2_context, text):
+    return convert_markup(j2_context, text, "md")
+
+
+class SubtreeCache:
+    """
+    Rendered option and return value subtrees
+
+    Modules that extend the same doc fragments share options, often with
+    nested suboptions, which the templates render with the same macros over
+    and over. Subtrees are looked up by the template, the macro, the nesting
+    level, and a hash of their structure. The current plugin is only part
+    of the key when the subtree contains O() or RV() markup, which is the
+    only markup whose output depends on it.
+
+    Most subtrees occur only once, so the first time a subtree is seen, only
+    its cheap fingerprint is recorded. Subtrees are hashed and stored once
+    their fingerprint comes up again, which keeps unique subtrees from
+    costing time or memory.
+    """
+
+    def __init__(self, size=DEFAULT_SUBTREE_CACHE_SIZE):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._fingerprints = collections.OrderedDict()
+        self._texts = collections.OrderedDict()
+
+    def render(self, j2_context, macro, specs, level):
+        if self.size == 0:
+            return macro(specs, level)
+
+        fingerprint = model.fingerprint(specs)
+        if fingerprint not in self._fingerprints:
+            self._fingerprints[fingerprint] = None
+            if len(self._fingerprints) > self.size:
+                self._fingerprints.popitem(last=False)
+            self.misses += 1
+            return macro(specs, level)
+        self._fingerprints.move_to_end(fingerprint)
+
+        digest, uses_plugin = model.describe(specs)
+        plugin = get_context(j2_context) if uses_plugin else None
+        key = j2_context.name, macro.name, level, plugin, digest
+
+        text = self._texts.get(key)
+        if text is not None:
+            self.hits += 1
+            self._texts.move_to_end(key)
+            return text
+
+        self.misses += 1
+        text = self._texts[key] = macro(specs, level)
+        if len(self._texts) > self.size:
+            self._texts.popitem(last=False)
+        return text
+
+
+_subtree_cache = SubtreeCache()
+
+
+def configure_subtree_cache(size):
+    global _subtree_cache
+    _subtree_cache = SubtreeCache(size)
+
+
+def subtree_cache_info():
+    return _subtree_cache.hits, _subtree_cache.misses
+
+
+@pass_context
+def cached_subtree(j2_context, macro, specs, level):
+    """
+    Return the output of macro(specs, level), rendered only once for equal
+    subtrees
+    """
+    return _subtree_cache.render(j2_context, macro, specs, level)
+
+
+model.register_yaml_representer(yaml.SafeDumper)
+
+
+def get_ansible_version():
+    from ansible.release import __version__
+    return __version__
+
+
+def safe_to_yaml(a, *args, **kw):
+    # Replacement for ansible's to_yaml filter when ansible is not used
+    default_flow_style = kw.pop("default_flow_style", None)
+    return yaml.safe_dump(
+        a, allow_unicode=True, default_flow_style=default_flow_style, **kw
+    )
+
+
+def get_to_yaml_filter(engine):
+    if engine != "ansible":
+        return safe_to_yaml
+
+    from ansible.parsing.yaml.dumper import AnsibleDumper
+    from ansible.plugins.filter.core import to_yaml
+    model.register_yaml_representer(AnsibleDumper)
+    return to_yaml
+
+
+def load_ansible_yaml(text, path):
+    from ansible.parsing.yaml.loader import AnsibleLoader
+    return AnsibleLoader(text, file_name=path).get_single_data()
+
+
+def get_fragment_cache(engine, cache_dir=None):
+    directory = None
+    if cache_dir is not None:
+        directory = os.path.join(cache_dir, "fragments")
+
+    if engine == DUMP_ENGINE:
+        # Dumps already contain the merged doc fragments.
+        return fragments.FragmentCache(None, None)
+    if engine == "static":
+        return fragments.FragmentCache(
+            static.StaticFragmentLoader(), static.load_yaml, directory,
+            "static",
+        )
+
+    from ansible.plugins.loader import fragment_loader
+    return fragments.FragmentCache(
+        fragment_loader, load_ansible_yaml, directory, get_ansible_version(),
+    )
+
+
+def get_docstring(module, fragment_cache, engine):
+    if engine == "static":
+        return static.get_docstring(module, fragment_cache)
+    return fragments.get_docstring(module, fragment_cache)
+
+
+def extract_module_docs(module, fragment_cache, engine="ansible",
+                        plugin_type=None, collection_name=None):
+    """
+    Return the documentation of the module, prepared for the template, and
+    the list of paths of doc fragments that it extends
+
+    The plugin type and the collection name, when known, are passed to the
+    template, where they resolve references to the current plugin.
+    Collection plugins without documentation raise a CollectionError.
+    """
+    if engine == DUMP_ENGINE:
+        with profiling.stage("docstring"):
+            return dump.load(module), []
+
+    with profiling.stage("docstring"):
+        doc, examples, returndocs, metadata, fragment_paths = get_docstring(
+            module, fragment_cache, engine,
+        )
+
+    if doc is None and plugin_type is not None:
+        raise collection.CollectionError(
+            "{} has no documentation, prefix its name with an underscore "
+            "if it is not a plugin".format(module)
+        )
+
+    with profiling.stage("normalize"):
+        normalize_module_docs(doc, examples, returndocs, metadata)
+
+    if plugin_type is not None:
+        doc["plugin_type"] = plugin_type
+    if collection_name is not None:
+        doc["collection"] = collection_name
+
+    return doc, fragment_paths
+
+
+def normalize_module_docs(doc, examples, returndocs, metadata):
+    """
+    Add examples, return values, and metadata to the documentation and bring
+    it into the shape that the templates expect
+    """
+    returndocs = returndocs or {}
+    if isinstance(returndocs, str):
+        returndocs = yamlbackend.safe_load(returndocs)
+
+    doc.update(
+        examples=examples,
+        returndocs=returndocs,
+        metadata=metadata,
+    )
+
+    doc["author"] = ensure_list(doc["author"])
+    doc["description"] = ensure_list(doc["description"])
+    if "options" in doc:
+        doc["options"] = model.build_specs(doc["options"])
+    doc["returndocs"] = model.build_specs(doc["returndocs"])
+
+    if "module" in doc:
+        doc["plugin_type"] = "module"
+    else:
+        doc["module"] = doc["name"].split(".")[-1]
+
+
+def render_module_docs(output_folder, module, templates,
+                       fragment_cache=None, engine="ansible",
+                       skip_unchanged=False, plugin_type=None,
+                       collection_name=None, archive=False,
+                       find_references=False, write=True, stream=False):
+    """
+    Extract the documentation of the module once and render it with each of
+    the (folder, template, extension) templates into the output folder
+    within the template's folder
+
+    With find_references set, references to other plugins are collected for
+    checking. With write unset, the encoded documents are returned instead
+    of written, so that the main process can add them to an archive or hand
+    them to its background writer. With stream set, written documents are
+    written in chunks while the template generates them instead of being
+    rendered into a single string first.
+    """
+    # Archives can be written to stdout, so progress goes to stderr.
+    print("Rendering {}".format(module), file=sys.stderr if archive else None)
+    if fragment_cache is None:
+        fragment_cache = get_fragment_cache(engine)
+    fragment_info = (
+        fragment_cache.hits, fragment_cache.disk_hits, fragment_cache.misses,
+    )
+    markup_info = markup_cache_info()
+    subtree_info = subtree_cache_info()
+    profiler = profiling.get_profiler()
+    profiler.start_module(module)
+
+    doc, fragment_paths = extract_module_docs(
+        module, fragment_cache, engine, plugin_type, collection_name,
+    )
+
+    plugin_references = None
+    if find_references:
+        with profiling.stage("references"):
+            plugin_references = references.find_references(doc)
+
+    output_paths = []
+    data = None if write else []
+    written = 0
+    for folder, template, extension in templates:
+        output_path = os.path.join(
+            folder, output_folder, doc["module"] + "." + extension
+        )
+        output_paths.append(output_path)
+        if write and stream:
+            with profiling.stage("render"):
+                written += output.write_chunks(
+                    output_path, template.generate(doc), skip_unchanged,
+                )
+            continue
+
+        with profiling.stage("render"):
+            text = template.render(doc)
+
+        with profiling.stage("write"):
+            if write:
+                written += output.write_file(output_path, text, skip_unchanged)
+            else:
+                data.append(output.encode(text))
+                written += 1
+
+    return dict(
+        module=module,
+        outputs=output_paths,
+        fragments=fragment_paths,
+        summary=index.get_summary(doc),
+        references=plugin_references,
+        data=data,
+        profile=profiler.finish_module(),
+        stats=dict(
+            written=written,
+            unchanged=len(templates) - written,
+            fragment_hits=fragment_cache.hits - fragment_info[0],
+            fragment_disk_hits=fragment_cache.disk_hits - fragment_info[1],
+            fragment_misses=fragment_cache.misses - fragment_info[2],
+            markup_hits=markup_cache_info().hits - markup_info.hits,
+            markup_misses=markup_cache_info().misses - markup_info.misses,
+            subtree_hits=subtree_cache_info()[0] - subtree_info[0],
+            subtree_misses=subtree_cache_info()[1] - subtree_info[1],
+        ),
+    )
+
+
+def get_default_template_name(markdown, kind="module"):
+    if markdown:
+        return kind + ".md.j2"
+    return kind + ".rst.j2"
+
+
+def get_default_template(env, markdown, kind="module"):
+    return env.get_template(get_default_template_name(markdown, kind))
+
+
+def get_template_source(template_source, markdown, kind="module"):
+    if template_source is not None:
+        return template_source
+    path = os.path.join(
+        os.path.dirname(__file__), "templates",
+        get_default_template_name(markdown, kind),
+    )
+    with open(path) as fd:
+        return fd.read()
+
+
+class TemplateBytecodeCache(FileSystemBytecodeCache):
+    """
+    Compiled template cache that never fails rendering
+
+    Jinja2 stores compiled templates under a key derived from the template
+    name and validates them against the checksum of the template source.
+    """
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        super().__init__(directory)
+
+    def dump_bytecode(self, bucket):
+        try:
+            super().dump_bytecode(bucket)
+        except OSError:
+            pass
+
+
+def get_bytecode_cache(directory):
+    if directory is None:
+        return None
+    try:
+        return TemplateBytecodeCache(directory)
+    except OSError:
+        return None
+
+
+# Settings of the Jinja2 environment that templates are compiled in. Compiled
+# templates depend on them, so they are part of the template cache key.
+ENVIRONMENT_OPTIONS = dict(trim_blocks=True)
+
+_templates = collections.OrderedDict()
+
+_template_filters = dict(rst_ify=rst_ify, md_ify=md_ify)
+
+_template_globals = dict(cached_subtree=cached_subtree)
+
+
+def get_template_cache_dir(cache_dir=None):
+    """
+    Return the directory for templates compiled in this tool's environment
+    """
+    return cache.get_template_cache_dir(cache_dir, json.dumps(dict(
+        options=ENVIRONMENT_OPTIONS,
+        # The to_yaml filter depends on the engine.
+        filters=sorted(_template_filters) + ["to_yaml"],
+        globals=sorted(_template_globals),
+    ), sort_keys=True))
+
+
+def load_template(template_source, markdown, template_cache_dir=None,
+                  engine="ansible", kind="module"):
+    """
+    Return the custom template, or the default template of the kind (module
+    or index) when template_source is None, and the extension of the
+    documents that it renders
+    """
+    loader = PackageLoader("ansible_doc_extractor")
+    if template_source is not None:
+        # Custom templates are loaded by name instead of from_string so that
+        # they can use the compiled template cache. Naming them after their
+        # content keeps different custom templates from evicting each other.
+        custom_name = "custom-{}.j2".format(cache.hash_text(template_source))
+        loader = ChoiceLoader([DictLoader({custom_name: template_source}), loader])
+
+    env = Environment(
+        loader=loader, bytecode_cache=get_bytecode_cache(template_cache_dir),
+        **ENVIRONMENT_OPTIONS
+    )
+    env.filters.update(_template_filters)
+    env.globals.update(_template_globals)
+    env.filters["to_yaml"] = get_to_yaml_filter(engine)
+    env.policies["json.dumps_kwargs"] = dict(
+        sort_keys=True, default=model.json_default,
+    )
+
+    if template_source is not None:
+        template = env.get_template(custom_name)
+    else:
+        template = get_default_template(env, markdown, kind)
+
+    if markdown:
+        extension = "md"
+    else:
+        extension = "rst"
+
+    return template, extension
+
+
+def get_template(custom_template, markdown):
+    return load_template(read_template_source(custom_template), markdown)
+
+
+def get_cached_template(template_path, output_format, template_cache_dir=None,
+                        engine="ansible"):
+    """
+    Return the template from the template file, or the default template of
+    the format (rst or md) when template_path is None, and the extension of
+    the documents that it renders
+
+    The most recently used templates are kept and looked up by their source,
+    so edited templates are compiled again.
+    """
+    if output_format not in _supported_templates:
+        raise ValueError("Unsupported format {!r}".format(output_format))
+
+    source = None
+    if template_path is not None:
+        with open(template_path) as fd:
+            source = fd.read()
+
+    key = source, output_format, template_cache_dir, engine
+    if key in _templates:
+        _templates.move_to_end(key)
+    else:
+        _templates[key] = load_template(
+            source, output_format == "md", template_cache_dir, engine,
+        )
+        if len(_templates) > MAX_TEMPLATES:
+            _templates.popitem(last=False)
+    return _templates[key]
+
+
+def read_template_source(custom_template):
+    if not custom_template:
+        return None
+    source = custom_template.read()
+    custom_template.close()
+    return source
+
+
+def init_ansible():
+    try:
+        from ansible.plugins.loader import init_plugin_loader
+    except ImportError:  # ansible-core < 2.15
+        return
+    init_plugin_loader()
+
+
+def init_engine(engine):
+    # The static engine does not need ansible's plugin loader.
+    if engine == "ansible":
+        init_ansible()
+
+
+class Options:
+    """
+    Rendering settings shared by all processes
+    """
+
+    def __init__(self, template_source=None, markdown=False, engine="ansible",
+                 cache_dir=None, markup_cache_size=DEFAULT_MARKUP_CACHE_SIZE,
+                 template_cache_dir=None, skip_unchanged=False,
+                 archive=False, profile=False, dump_format=None, outputs=None,
+                 check_references=False, writer_threads=0,
+                 write_queue_size=DEFAULT_WRITE_QUEUE_SIZE, stream=False,
+                 yaml_backend="auto",
+                 subtree_cache_size=DEFAULT_SUBTREE_CACHE_SIZE):
+        self.template_source = template_source
+        self.markdown = markdown
+        self.engine = engine
+        self.cache_dir = cache_dir
+        self.markup_cache_size = markup_cache_size
+        self.template_cache_dir = template_cache_dir
+        self.skip_unchanged = skip_unchanged
+        self.archive = archive
+        self.profile = profile
+        self.dump_format = dump_format
+        self.outputs = outputs
+        self.check_references = check_references
+        self.writer_threads = writer_threads
+        self.write_queue_size = write_queue_size
+        self.stream = stream
+        self.yaml_backend = yaml_backend
+        self.subtree_cache_size = subtree_cache_size
+
+    def get_outputs(self):
+        """
+        Return the (folder, template source, markdown, extension) outputs,
+        which are the template source and markdown settings unless several
+        outputs are set
+        """
+        if self.outputs is not None:
+            return self.outputs
+        extension = "md" if self.markdown else "rst"
+        return [("", self.template_source, self.markdown, extension)]
+
+
+class Renderer:
+    """
+    Per-process rendering state
+
+    Compiling the template, initializing the plugin loader, and warming up
+    the caches is done once per process. Renderers cannot be sent between
+    processes, so each pool worker creates its own from the options.
+    """
+
+    def __init__(self, options):
+        self.options = options
+        self.load_template()
+        init_engine(options.engine)
+        configure_markup_cache(options.markup_cache_size)
+        configure_subtree_cache(options.subtree_cache_size)
+        yamlbackend.configure(options.yaml_backend)
+        if options.profile:
+            profiling.enable()
+        self.fragment_cache = get_fragment_cache(
+            options.engine, options.cache_dir,
+        )
+
+    def load_template(self):
+        if self.options.dump_format is not None:
+            self.templates = [(
+                "", dump.Dumper(self.options.dump_format),
+                self.options.dump_format,
+            )]
+            return
+        self.templates = []
+        for folder, source, markdown, extension in self.options.get_outputs():
+            template, _ = load_template(
+                source, markdown, self.options.template_cache_dir,
+                self.options.engine,
+            )
+            self.templates.append((folder, template, extension))
+
+    def render(self, output, module, plugin_type=None, collection_name=None):
+        return render_module_docs(
+            output, module, self.templates,
+            self.fragment_cache, self.options.engine,
+            self.options.skip_unchanged, plugin_type, collection_name,
+            self.options.archive, self.options.check_references,
+            not (self.options.archive or self.options.writer_threads),
+            self.options.stream and self.options.dump_format is None,
+        )
+
+
+_worker_renderer = None
+
+
+def _init_worker(options):
+    global _worker_renderer
+    _worker_renderer = Renderer(options)
+
+
+def _render_in_worker(task):
+    return _worker_renderer.render(*task)
+
+
+def get_jobs(jobs, tasks):
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    return max(1, min(jobs, len(tasks)))
+
+
+def render_modules(tasks, options, jobs):
+    """
+    Render (output folder, module, plugin type, collection name) tasks and
+    yield the results in order
+
+    Results are only rendered a few tasks ahead of the consumer, so memory
+    use does not grow with the number of tasks when the consumer is slow.
+    """
+    if not tasks:
+        return
+
+    jobs = get_jobs(jobs, tasks)
+
+    if jobs == 1:
+        renderer = Renderer(options)
+        for task in tasks:
+            yield renderer.render(*task)
+        return
+
+    with multiprocessing.Pool(
+        jobs, initializer=_init_worker, initargs=(options,),
+    ) as pool:
+        # Pool.imap would keep dispatching tasks and hold all results that
+        # the consumer did not take yet.
+        pending = collections.deque()
+        for task in tasks:
+            if len(pending) >= TASKS_AHEAD_PER_JOB * jobs:
+                yield pending.popleft().get()
+            pending.append(pool.apply_async(_render_in_worker, (task,)))
+        while pending:
+            yield pending.popleft().get()
+
+
+def get_collection_tasks(output, collection_root):
+    """
+    Return render tasks for all plugins of the collection, which are written
+    into a subfolder of the output folder for each plugin type
+    """
+    collection_name = collection.get_collection_name(collection_root)
+    return [
+        (os.path.join(output, plugin_type), path, plugin_type, collection_name)
+        for plugin_type, path in collection.find_plugins(collection_root)
+    ]
+
+
+def get_build_cache(options):
+    if options.dump_format is not None:
+        template_source, extension = "", options.dump_format
+    else:
+        outputs = options.get_outputs()
+        template_source = "\0".join(
+            get_template_source(source, markdown)
+            for _, source, markdown, _ in outputs
+        )
+        extension = ",".join(extension for _, _, _, extension in outputs)
+
+    engine_version = options.engine
+    if options.engine == "ansible":
+        engine_version = get_ansible_version()
+    build_key = cache.get_build_key(template_source, extension, engine_version)
+    return cache.BuildCache(options.cache_dir, build_key)
+
+
+def get_outputs(root, formats=None, templates=None):
+    """
+    Return the (folder, template source, markdown, extension) outputs for
+    the formats (rst or md) and the (custom template, extension) pairs, or
+    None if there are none
+
+    Each output is rendered into a subfolder of root named after its
+    extension.
+    """
+    outputs = [(name, None, name == "md") for name in formats or ()]
+    outputs.extend(
+        (extension, read_template_source(custom_template), extension == "md")
+        for custom_template, extension in templates or ()
+    )
+    if not outputs:
+        return None
+    return [
+        (os.path.join(root, extension), source, markdown, extension)
+        for extension, source, markdown in outputs
+    ]
+
+
+def create_options(custom_template, markdown, cache_dir=None,
+                   engine="ansible", markup_cache_size=DEFAULT_MARKUP_CACHE_SIZE,
+                   template_cache=True, skip_unchanged=False,
+                   archive=False, profile=False, dump_format=None,
+                   outputs=None, check_references=False, writer_threads=0,
+                   write_queue_size=DEFAULT_WRITE_QUEUE_SIZE, stream=False,
+                   yaml_backend="auto",
+                   subtree_cache_size=DEFAULT_SUBTREE_CACHE_SIZE):
+    template_cache_dir = None
+    if template_cache:
+        template_cache_dir = get_template_cache_dir(cache_dir)
+
+    return Options(
+        read_template_source(custom_template), markdown, engine, cache_dir,
+        markup_cache_size, template_cache_dir, skip_unchanged, archive,
+        profile, dump_format, outputs, check_references, writer_threads,
+        write_queue_size, stream, yaml_backend, subtree_cache_size,
+    )
+
+
+class IndexRenderer:
+    """
+    Index pages of the outputs, rendered from the summaries of the plugins
+
+    Outputs get an index page if they have an index template or use a
+    format with a default index template (rst or md).
+    """
+
+    def __init__(self, options, root, index_templates=None):
+        self.index = index.Index()
+        sources = {
+            extension: read_template_source(custom_template)
+            for custom_template, extension in index_templates or ()
+        }
+        self.templates = []
+        for position, output in enumerate(options.get_outputs()):
+            folder, _, _, extension = output
+            source = sources.get(extension, sources.get(None))
+            if source is None and extension not in _supported_templates:
+                continue
+            template, _ = load_template(
+                source, extension == "md", options.template_cache_dir,
+                options.engine, "index",
+            )
+            self.templates.append(
+                (position, folder or root, template, extension),
+            )
+
+    def add(self, summary, outputs):
+        self.index.add(summary, outputs)
+
+    def render(self):
+        """
+        Yield the path and the text of each index page
+        """
+        for position, folder, template, extension in self.templates:
+            context = self.index.get_context(position, folder, extension)
+            path = os.path.join(folder, "index." + extension)
+            yield path, template.render(context)
+
+
+def render_docs(output, modules, custom_template, markdown, jobs=None,
+                cache_dir=None, engine="ansible",
+                markup_cache_size=DEFAULT_MARKUP_CACHE_SIZE,
+                template_cache=True, skip_unchanged=False, collection_root=None,
+                archive_format=None, profile=False, profile_json=None,
+                profile_trace=None, dump_format=None, formats=None,
+                templates=None, index_pages=False, index_templates=None,
+                check_references=False, writer_threads=0,
+                write_queue_size=DEFAULT_WRITE_QUEUE_SIZE, stream=False,
+                yaml_backend="auto",
+                subtree_cache_size=DEFAULT_SUBTREE_CACHE_SIZE, shard=None,
+                shard_timings=None):
+    """
+    Render documentation into the output folder or, when the archive format
+    is set, into the output archive file (- for stdout)
+
+    With profile set, time spent in each rendering stage is reported and,
+    optionally, saved as JSON or as a Chrome trace. With dump_format set,
+    the extracted documentation is dumped instead of rendered. The dump
+    engine renders dump files, or directories with dumps, in place of
+    modules. Formats and (custom template, extension) templates render each
+    module into several outputs, which are written into subfolders named
+    after their extensions. With index_pages set, an index page of all
+    plugins is added to each output, using the (custom template, extension)
+    index templates if given. Index templates without an extension apply to
+    all outputs. With check_references set, references to plugins of the
+    run that do not exist are reported. With writer_threads set, files are
+    written by that many threads of the main process while the next modules
+    are rendered, with at most write_queue_size modules waiting. With
+    stream set, documents are written while they are rendered, which keeps
+    large documents out of memory. The YAML backend (auto, libyaml, or
+    python) parses the YAML that ansible does not parse. With shard set to
+    (index, count), only the index-th of count subsets of the modules, which
+    are balanced by file size or by the wall times in the shard_timings
+    profile, is rendered, and index summaries are written into a shard
+    manifest that merge_shards() turns into index pages.
+    """
+    root = output if archive_format is None else ""
+    outputs = get_outputs(root, formats, templates)
+    options = create_options(
+        custom_template, markdown, cache_dir, engine, markup_cache_size,
+        template_cache, skip_unchanged, archive_format is not None, profile,
+        dump_format, outputs, check_references, writer_threads,
+        write_queue_size, stream, yaml_backend, subtree_cache_size,
+    )
+    # Tasks of collections are named after their galaxy.yml files.
+    yamlbackend.configure(yaml_backend)
+
+    index_renderer = None
+    if index_pages and dump_format is None:
+        index_renderer = IndexRenderer(options, root, index_templates)
+
+    # Output folders of tasks are relative to the folders of the outputs.
+    if outputs is not None:
+        root = ""
+    tasks = get_tasks(root, modules, collection_root, engine)
+
+    checker = None
+    if check_references:
+        checker = references.ReferenceChecker(
+            references.build_plugin_index(tasks),
+        )
+
+    # References are checked against the plugins of all shards.
+    if shard is not None:
+        if archive_format is None:
+            index_renderer = sharding.ShardManifest(
+                output, shard[0], shard[1], sharding.get_tasks_key(tasks),
+            )
+        tasks = get_shard_tasks(
+            tasks, shard, shard_timings, archive_format is not None,
+        )
+
+    report = profiling.Report()
+    if archive_format is None:
+        stats = render_files(
+            tasks, options, jobs, report, index_renderer, checker,
+        )
+        log_file = None
+    else:
+        stats = render_archive(
+            output, archive_format, tasks, options, jobs, report,
+            index_renderer, checker,
+        )
+        # Archives can be written to stdout.
+        log_file = sys.stderr
+
+    if checker is not None:
+        checker.print_report(file=log_file)
+    print_stats(stats, skip_unchanged, file=log_file)
+    if profile:
+        print_profile(report, profile_json, profile_trace, file=log_file)
+
+
+def render_files(tasks, options, jobs, report, index_renderer=None,
+                 checker=None):
+    folders = [folder for folder, _, _, _ in options.get_outputs()]
+    for task_folder in {task[0] for task in tasks}:
+        for folder in folders:
+            os.makedirs(os.path.join(folder, task_folder), exist_ok=True)
+
+    build_cache = None
+    if options.cache_dir is not None:
+        build_cache = get_build_cache(options)
+        pending = []
+        for task in tasks:
+            if not is_cached(build_cache, task[1], [
+                os.path.join(folder, task[0]) for folder in folders
+            ], checker is not None):
+                pending.append(task)
+                continue
+
+            # Skipped modules keep their entries in the index, and their
+            # references are checked again because plugins they refer to
+            # might be gone.
+            entry = build_cache.get_entry(task[1])
+            if index_renderer is not None:
+                index_renderer.add(entry["summary"], entry["outputs"])
+            if checker is not None:
+                checker.check(task[1], entry["references"])
+        tasks = pending
+
+    writer = None
+    if options.writer_threads:
+        writer = output.BackgroundWriter(
+            options.writer_threads, options.write_queue_size,
+            options.skip_unchanged,
+        )
+
+    stats = collections.Counter()
+    try:
+        for result in render_modules(tasks, options, jobs):
+            stats.update(result["stats"])
+            report.add(result["module"], result["profile"])
+            if index_renderer is not None:
+                index_renderer.add(result["summary"], result["outputs"])
+            if checker is not None:
+                checker.check(result["module"], result["references"])
+
+            update_cache = None
+            if build_cache is not None:
+                update_cache = functools.partial(
+                    build_cache.update, result["module"], result["outputs"],
+                    result["fragments"], result["summary"],
+                    result["references"],
+                )
+            if writer is not None:
+                # Modules are only recorded in the build cache once their
+                # documents are written.
+                writer.write(
+                    list(zip(result["outputs"], result["data"])), update_cache,
+                )
+            elif update_cache is not None:
+                update_cache()
+    finally:
+        try:
+            if writer is not None:
+                writer.close()
+        finally:
+            if build_cache is not None:
+                build_cache.save()
+
+    if writer is not None:
+        stats["written"] = writer.written
+        stats["unchanged"] = writer.unchanged
+        stats["write_queue_size"] = options.write_queue_size
+        stats["write_queue_high_water_mark"] = writer.high_water_mark
+        stats["write_stall_time"] = writer.stall_time
+
+    if index_renderer is not None:
+        write_pages(index_renderer.render(), options.skip_unchanged)
+    return stats
+
+
+def write_pages(pages, skip_unchanged=False):
+    """
+    Write the (path, text) pages, creating their folders, which do not exist
+    yet when no module was rendered into them
+    """
+    for page, text in pages:
+        os.makedirs(os.path.dirname(page) or ".", exist_ok=True)
+        output.write_file(page, text, skip_unchanged)
+
+
+def render_archive(path, archive_format, tasks, options, jobs, report,
+                   index_renderer=None, checker=None):
+    """
+    Render documentation into an archive that is written while the modules
+    are rendered, so only a few documents are in memory at any time
+
+    The build cache is not used because the archive always contains all
+    documents.
+    """
+    stats = collections.Counter()
+    with archive.open_archive(path, archive_format) as docs:
+        for result in render_modules(tasks, options, jobs):
+            for name, data in zip(result["outputs"], result["data"]):
+                docs.add(name, data)
+            stats.update(result["stats"])
+            report.add(result["module"], result["profile"])
+            if index_renderer is not None:
+                index_renderer.add(result["summary"], result["outputs"])
+            if checker is not None:
+                checker.check(result["module"], result["references"])
+
+        if index_renderer is not None:
+            for page, text in index_renderer.render():
+                docs.add(page, output.encode(text))
+    return stats
+
+
+def get_tasks(output, modules, collection_root=None, engine="ansible"):
+    if engine == DUMP_ENGINE:
+        return [
+            (os.path.join(output, subfolder), path, None, None)
+            for subfolder, path in dump.find_dumps(modules)
+        ]
+
+    tasks = [(output, module, None, None) for module in modules]
+    if collection_root is not None:
+        tasks.extend(get_collection_tasks(output, collection_root))
+    return tasks
+
+
+def get_shard_tasks(tasks, shard, timings_path=None, archive=False):
+    """
+    Return the tasks of the (index, count) shard
+    """
+    timings = None
+    if timings_path is not None:
+        timings = sharding.load_timings(timings_path)
+    costs = sharding.get_costs(tasks, timings)
+    selected = sharding.select(tasks, shard[0], shard[1], costs)
+    # Archives can be written to stdout.
+    print("Shard {} of {}: {} of {} modules".format(
+        shard[0], shard[1], len(selected), len(tasks),
+    ), file=sys.stderr if archive else None)
+    return selected
+
+
+def merge_shards(root, custom_template, markdown, cache_dir=None,
+                 engine="ansible", template_cache=True, skip_unchanged=False,
+                 formats=None, templates=None, index_pages=False,
+                 index_templates=None):
+    """
+    Combine the shard manifests in the output folder, which runs with shard
+    set wrote, into the index pages of a single run and remove them
+
+    The formats, templates, and index settings must match the ones of the
+    shards.
+    """
+    outputs = get_outputs(root, formats, templates)
+    options = create_options(
+        custom_template, markdown, cache_dir, engine,
+        template_cache=template_cache, skip_unchanged=skip_unchanged,
+        outputs=outputs,
+    )
+    index_renderer = None
+    if index_pages:
+        index_renderer = IndexRenderer(options, root, index_templates)
+
+    manifests, plugins = sharding.merge(root, index_renderer)
+    if index_renderer is not None:
+        write_pages(index_renderer.render(), skip_unchanged)
+    for path in manifests:
+        os.remove(path)
+    print("Merged {} shards with {} plugins".format(len(manifests), plugins))
+
+
+def print_stats(stats, skip_unchanged=False, file=None):
+    if skip_unchanged:
+        print("Output files: {} written, {} unchanged".format(
+            stats["written"], stats["unchanged"],
+        ), file=file)
+    if "write_queue_size" in stats:
+        print("Background writer: queue high-water mark {} of {}, {:.3f}s "
+              "write stall time".format(
+                  stats["write_queue_high_water_mark"],
+                  stats["write_queue_size"], stats["write_stall_time"],
+              ), file=file)
+    for name, title in (
+        ("fragment", "Doc fragment"), ("markup", "Markup"),
+        ("subtree", "Subtree"),
+    ):
+        hits, misses = stats[name + "_hits"], stats[name + "_misses"]
+        # Only doc fragments are also cached on disk between runs.
+        disk_hits = stats[name + "_disk_hits"]
+        total = hits + disk_hits + misses
+        if total == 0:
+            continue
+        disk = ""
+        if disk_hits:
+            disk = " {} disk hits,".format(disk_hits)
+        print("{} cache: {} hits,{} {} misses ({:.0%} hit rate)".format(
+            title, hits, disk, misses, (hits + disk_hits) / total,
+        ), file=file)
+
+
+def print_profile(report, json_path=None, trace_path=None, file=None):
+    report.finish()
+    report.print_summary(file=file)
+    report.save(json_path, trace_path)
+
+
+def is_cached(build_cache, module, output_folders, references=False):
+    if build_cache.is_fresh(module, output_folders, references):
+        print("Skipping {} (unchanged)".format(module))
+        return True
+    return False
@@ -0,0 +1,124 @@
+"""
+Render server that keeps ansible and the templates loaded between requests
+
+Clients connect to a Unix domain socket and send one JSON object per line:
+
+    {"module": "/path/to/module.py", "format": "rst", "template": "/t.j2"}
+
+Format (rst or md) and template are optional. The server answers each
+request with one JSON object per line that contains the rendered text or an
+error message, and the time spent on each step. Each connection is served by
+a thread of its own, so clients can keep their connections open, but
+requests are rendered one at a time because the caches are not thread-safe.
+"""
+
+import json
+import os
+import socket
+import socketserver
+import stat
+import threading
+import time
+import traceback
+
+from ansible_doc_extractor import render, watch, yamlbackend
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                response = self.server.render(json.loads(line))
+            except Exception as e:
+                traceback.print_exc()
+                response = dict(error="{}: {}".format(type(e).__name__, e))
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+class RenderServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    # Open connections do not keep the server from stopping.
+    daemon_threads = True
+
+    def __init__(self, socket_path, options):
+        self.options = options
+        self._lock = threading.Lock()
+        render.init_engine(options.engine)
+        render.configure_markup_cache(options.markup_cache_size)
+        render.configure_subtree_cache(options.subtree_cache_size)
+        yamlbackend.configure(options.yaml_backend)
+        self.fragment_cache = render.get_fragment_cache(
+            options.engine, options.cache_dir,
+        )
+        remove_stale_socket(socket_path)
+        super().__init__(socket_path, RequestHandler)
+
+    def render(self, request):
+        with self._lock:
+            return self._render(request)
+
+    def _render(self, request):
+        start = time.perf_counter()
+        template, extension = render.get_cached_template(
+            request.get("template"), request.get("format", "rst"),
+            self.options.template_cache_dir, self.options.engine,
+        )
+        watch.refresh_fragments(self.fragment_cache)
+        prepared = time.perf_counter()
+
+        doc, _ = render.extract_module_docs(
+            request["module"], self.fragment_cache, self.options.engine,
+        )
+        extracted = time.perf_counter()
+
+        text = template.render(doc)
+        rendered = time.perf_counter()
+
+        return dict(
+            module=request["module"],
+            name=doc["module"],
+            extension=extension,
+            text=text,
+            timing=dict(
+                prepare=prepared - start,
+                extract=extracted - prepared,
+                render=rendered - extracted,
+                total=rendered - start,
+            ),
+        )
+
+
+def remove_stale_socket(socket_path):
+    try:
+        if stat.S_ISSOCK(os.stat(socket_path).st_mode):
+            os.remove(socket_path)
+    except FileNotFoundError:
+        pass
+
+
+def serve(socket_path, **kwargs):
+    options = render.create_options(None, False, **kwargs)
+    with RenderServer(socket_path, options) as server:
+        print("Listening on {}".format(socket_path), flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(socket_path)
+
+
+def request(socket_path, module, output_format="rst", template=None):
+    """
+    Send a single render request to the server and return the response
+    """
+    data = dict(module=module, format=output_format)
+    if template is not None:
+        data["template"] = template
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        with sock.makefile("rwb") as stream:
+            stream.write(json.dumps(data).encode("utf-8") + b"\n")
+            stream.flush()
+            return json.loads(stream.readline())
@@ -0,0 +1,213 @@
+"""
+Deterministic sharding of render tasks across machines
+
+Each shard of a run renders a subset of the modules. Subsets are balanced by
+an estimated cost: the size of the module file or, for modules listed in a
+profile written by --profile-json, their recorded wall time. Every shard
+computes the same assignment from the same modules and profile, so shards
+need no coordination.
+
+Shards write a manifest with the index summaries of their plugins into the
+output folder instead of index pages. Merging the manifests of all shards
+writes the index pages that a single run would have written.
+"""
+
+import glob
+import hashlib
+import heapq
+import json
+import os
+import os.path
+import re
+
+MANIFEST_PATTERN = "ansible-doc-extractor-shard-{}-of-{}.json"
+
+MANIFEST_FORMAT = 1
+
+_manifest_re = re.compile(
+    r"^ansible-doc-extractor-shard-(\d+)-of-(\d+)\.json$",
+)
+
+
+class ShardError(Exception):
+    pass
+
+
+def get_manifest_path(output, shard, count):
+    return os.path.join(output, MANIFEST_PATTERN.format(shard, count))
+
+
+def get_tasks_key(tasks):
+    """
+    Return a hash of all tasks of the run, which tells shards of different
+    runs apart
+    """
+    return hashlib.sha256(json.dumps([
+        [os.path.normpath(folder), os.path.normpath(module)]
+        for folder, module, _, _ in tasks
+    ]).encode("utf-8")).hexdigest()
+
+
+def load_timings(path):
+    """
+    Return the recorded wall times of modules from a --profile-json file
+    """
+    try:
+        with open(path) as fd:
+            modules = json.load(fd)["modules"]
+        return {
+            os.path.normpath(module): profile["wall"]
+            for module, profile in modules.items()
+        }
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        raise ShardError("Cannot read timings from {}: {}".format(path, e))
+
+
+def get_costs(tasks, timings=None):
+    """
+    Return the estimated cost of each task
+
+    File sizes are converted to seconds with the time per byte of the
+    modules that have recorded timings, so modules without timings are
+    estimated on the same scale.
+    """
+    sizes = [os.path.getsize(module) for _, module, _, _ in tasks]
+    if not timings:
+        return sizes
+
+    recorded = [
+        timings.get(os.path.normpath(module)) for _, module, _, _ in tasks
+    ]
+    timed_sizes = sum(s for s, t in zip(sizes, recorded) if t is not None)
+    timed_seconds = sum(t for t in recorded if t is not None)
+    per_byte = timed_seconds / timed_sizes if timed_sizes else 1.0
+    return [
+        size * per_byte if seconds is None else seconds
+        for size, seconds in zip(sizes, recorded)
+    ]
+
+
+def select(tasks, shard, count, costs):
+    """
+    Return the tasks of the shard (from 1 to count), in their original order
+
+    Tasks are assigned from the most to the least expensive one to the
+    shard with the lowest total cost so far, ties going to the lower shard
+    and the earlier task.
+    """
+    loads = [(0, i) for i in range(count)]
+    selected = []
+    order = sorted(range(len(tasks)), key=lambda i: (-costs[i], i))
+    for position in order:
+        load, index = heapq.heappop(loads)
+        if index == shard - 1:
+            selected.append(position)
+        heapq.heappush(loads, (load + costs[position], index))
+    return [tasks[position] for position in sorted(selected)]
+
+
+class ShardManifest:
+    """
+    Index summaries of the plugins of a shard, written in place of the
+    index pages
+
+    Manifests have the interface of the index page renderer, so they are
+    filled and written the same way.
+    """
+
+    def __init__(self, root, shard, count, tasks_key):
+        self.root = root
+        self.shard = shard
+        self.count = count
+        self.tasks_key = tasks_key
+        self.entries = []
+
+    def add(self, summary, outputs):
+        if summary is None:
+            return
+        # Paths are relative to the output folder, which can be somewhere
+        # else when the shards are merged.
+        self.entries.append((summary, [
+            os.path.relpath(path, self.root).replace(os.sep, "/")
+            for path in outputs
+        ]))
+
+    def render(self):
+        """
+        Yield the path and the text of the manifest
+        """
+        text = json.dumps(dict(
+            format=MANIFEST_FORMAT,
+            shard=self.shard,
+            count=self.count,
+            tasks=self.tasks_key,
+            plugins=self.entries,
+        ), indent=1)
+        yield get_manifest_path(self.root, self.shard, self.count), text + "\n"
+
+
+def find_manifests(output):
+    """
+    Return the paths of the manifests of all shards in the output folder,
+    ordered by shard
+    """
+    manifests = {}
+    counts = set()
+    for path in glob.glob(os.path.join(glob.escape(output), "*.json")):
+        match = _manifest_re.match(os.path.basename(path))
+        if match:
+            shard, count = int(match.group(1)), int(match.group(2))
+            manifests[shard] = path
+            counts.add(count)
+
+    if not manifests:
+        raise ShardError("No shard manifests found in {}".format(output))
+    if len(counts) > 1:
+        raise ShardError("Shards of runs with {} shards found in {}".format(
+            " and ".join(str(c) for c in sorted(counts)), output,
+        ))
+    count = counts.pop()
+    missing = [str(i) for i in range(1, count + 1) if i not in manifests]
+    if missing:
+        raise ShardError("Missing manifests of shards {} of {} in {}".format(
+            ", ".join(missing), count, output,
+        ))
+    return [manifests[i] for i in range(1, count + 1)]
+
+
+def merge(output, index_renderer=None):
+    """
+    Add the plugins of all shards in the output folder to the index page
+    renderer
+
+    Return the paths of the manifests, which can be removed once the index
+    pages are written, and the number of plugins.
+    """
+    paths = find_manifests(output)
+    manifests = []
+    for path in paths:
+        try:
+            with open(path) as fd:
+                manifests.append(json.load(fd))
+        except (OSError, ValueError) as e:
+            raise ShardError("Cannot read shard manifest {}: {}".format(
+                path, e,
+            ))
+    if any(m.get("format") != MANIFEST_FORMAT for m in manifests):
+        raise ShardError("Unsupported shard manifest format in {}".format(
+            output,
+        ))
+    if len({m["tasks"] for m in manifests}) > 1:
+        raise ShardError(
+            "Shards in {} rendered different modules".format(output)
+        )
+
+    plugins = 0
+    for manifest in manifests:
+        for summary, outputs in manifest["plugins"]:
+            plugins += 1
+            if index_renderer is not None:
+                index_renderer.add(summary, [
+                    os.path.join(output, path) for path in outputs
+                ])
+    return paths, plugins
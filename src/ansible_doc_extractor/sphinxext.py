@@ -0,0 +1,160 @@
+"""
+Sphinx extension that renders plugin documentation into Sphinx documents
+
+Add the extension to conf.py and include plugins with the ansible-module
+directive, whose path is relative to the document or, with a leading slash,
+to the source folder:
+
+    extensions = ["ansible_doc_extractor.sphinxext"]
+
+    .. ansible-module:: ../plugins/modules/user.py
+
+The ansible_doc_extractor_engine, ansible_doc_extractor_template, and
+ansible_doc_extractor_cache_dir settings correspond to the --engine,
+--template, and --cache-dir options. The template setting is relative to
+the folder of conf.py, the template option of the directive to the
+document.
+
+Extracted documentation is kept in the Sphinx environment together with the
+modification times and hashes of the plugin and its doc fragments. Rebuilds
+only extract plugins again when one of their files changed, and the files
+are Sphinx dependencies of the documents that include them, so documents are
+read again when their plugins change.
+"""
+
+import os
+import os.path
+
+from docutils.parsers.rst import directives
+from docutils.statemachine import string2lines
+from sphinx.util.docutils import SphinxDirective
+
+from ansible_doc_extractor import api, cache
+
+# Bump this when the layout of the cached entries changes.
+ENV_VERSION = 1
+
+
+def _get_docs(env):
+    if not hasattr(env, "ansible_doc_extractor_docs"):
+        env.ansible_doc_extractor_docs = {}
+    return env.ansible_doc_extractor_docs
+
+
+def _get_file_state(path):
+    mtime = os.stat(path).st_mtime_ns
+    with open(path, "rb") as fd:
+        return mtime, cache.hash_bytes(fd.read())
+
+
+def _is_fresh(files):
+    for path, (mtime, digest) in files.items():
+        try:
+            if os.stat(path).st_mtime_ns == mtime:
+                continue
+            new_mtime, new_digest = _get_file_state(path)
+        except OSError:
+            return False
+        if new_digest != digest:
+            return False
+        # Touched but unchanged files are not hashed again next time.
+        files[path] = new_mtime, digest
+    return True
+
+
+def extract(env, path, plugin_type=None, collection_name=None):
+    """
+    Return the documentation of the plugin and the paths of the files that
+    it was extracted from, which is only extracted again when a file changed
+    """
+    config = env.config
+    key = (
+        path, config.ansible_doc_extractor_engine, plugin_type,
+        collection_name,
+    )
+    docs = _get_docs(env)
+    entry = docs.get(key)
+    if entry is not None and _is_fresh(entry["files"]):
+        return entry["doc"], list(entry["files"])
+
+    state = _get_file_state(path)
+    doc, fragments = api.extract_docs(
+        path, config.ansible_doc_extractor_engine, plugin_type,
+        collection_name, config.ansible_doc_extractor_cache_dir,
+    )
+    files = {path: state}
+    for fragment in fragments:
+        fragment = os.path.abspath(fragment)
+        files[fragment] = _get_file_state(fragment)
+    docs[key] = dict(doc=doc, files=files)
+    return doc, list(files)
+
+
+class AnsibleModuleDirective(SphinxDirective):
+    """
+    Directive that inserts the rendered documentation of a plugin
+    """
+
+    required_arguments = 1
+    final_argument_whitespace = True
+    option_spec = {
+        "template": directives.path,
+        "plugin-type": directives.unchanged,
+        "collection": directives.unchanged,
+    }
+
+    def run(self):
+        _, path = self.env.relfn2path(self.arguments[0])
+        try:
+            doc, files = extract(
+                self.env, path, self.options.get("plugin-type"),
+                self.options.get("collection"),
+            )
+        except Exception as e:
+            raise self.error("Cannot extract documentation from {}: {}".format(
+                self.arguments[0], e,
+            ))
+
+        template = self.config.ansible_doc_extractor_template
+        if "template" in self.options:
+            _, template = self.env.relfn2path(self.options["template"])
+        if template is not None:
+            files.append(template)
+        for dependency in files:
+            self.env.note_dependency(dependency)
+
+        text = api.render(
+            doc, template, "rst", self.config.ansible_doc_extractor_engine,
+            self.config.ansible_doc_extractor_cache_dir,
+        )
+        self.state_machine.insert_input(
+            string2lines(text, convert_whitespace=True), path,
+        )
+        return []
+
+
+def resolve_template(app, config):
+    if config.ansible_doc_extractor_template is not None:
+        config.ansible_doc_extractor_template = os.path.join(
+            app.confdir, config.ansible_doc_extractor_template,
+        )
+
+
+def merge_docs(app, env, docnames, other):
+    # Documents read by parallel processes bring their extracted docs along.
+    _get_docs(env).update(_get_docs(other))
+
+
+def setup(app):
+    app.add_config_value("ansible_doc_extractor_engine", "ansible", "env")
+    app.add_config_value("ansible_doc_extractor_template", None, "env")
+    app.add_config_value("ansible_doc_extractor_cache_dir", None, "env")
+    app.add_directive("ansible-module", AnsibleModuleDirective)
+    app.connect("config-inited", resolve_template)
+    app.connect("env-merge-info", merge_docs)
+    return dict(
+        version=cache.get_tool_version(),
+        env_version=ENV_VERSION,
+        parallel_read_safe=True,
+        parallel_write_safe=True,
+    )
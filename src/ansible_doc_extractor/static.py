@@ -0,0 +1,234 @@
+"""
+Documentation extraction that does not need ansible
+
+Plugin documentation is read from the module's syntax tree without importing
+or executing any plugin code, and doc fragments are looked up on the
+collection search path.
+"""
+
+import ast
+import importlib.util
+import os
+import os.path
+import sys
+
+from ansible_doc_extractor import profiling, yamlbackend
+from ansible_doc_extractor.fragments import add_fragments
+
+DOC_VARIABLES = {
+    "DOCUMENTATION": "doc",
+    "EXAMPLES": "plainexamples",
+    "RETURN": "returndocs",
+    "ANSIBLE_METADATA": "metadata",
+}
+
+YAML_EXTENSIONS = (".yml", ".yaml")
+
+
+class StaticExtractionError(Exception):
+    pass
+
+
+def load_yaml(text, path):
+    try:
+        return yamlbackend.safe_load(text)
+    except yamlbackend.YAMLError as e:
+        raise StaticExtractionError("Unable to parse YAML in {}: {}".format(
+            path, e,
+        ))
+
+
+def read_docstring(filename):
+    data = dict.fromkeys(DOC_VARIABLES.values())
+
+    if filename.endswith(YAML_EXTENSIONS):
+        with open(filename, "rb") as fd:
+            file_data = load_yaml(fd.read(), filename) or {}
+        for variable, key in DOC_VARIABLES.items():
+            data[key] = file_data.get(variable)
+        return data
+
+    with open(filename, "rb") as fd:
+        tree = ast.parse(fd.read(), filename)
+
+    for node in tree.body:
+        if not isinstance(node, ast.Assign):
+            continue
+        for target in node.targets:
+            key = DOC_VARIABLES.get(getattr(target, "id", None))
+            if key is None:
+                continue
+            try:
+                value = ast.literal_eval(node.value)
+            except (TypeError, ValueError):
+                raise StaticExtractionError(
+                    "Cannot statically evaluate {} in {}".format(
+                        target.id, filename,
+                    )
+                )
+            # EXAMPLES are YAML, but are kept as text on purpose.
+            if isinstance(value, str) and key != "plainexamples":
+                value = load_yaml(value, filename)
+            data[key] = value
+
+    return data
+
+
+def read_class_attributes(filename, class_name):
+    with open(filename, "rb") as fd:
+        tree = ast.parse(fd.read(), filename)
+
+    attributes = {}
+    for node in tree.body:
+        if not isinstance(node, ast.ClassDef) or node.name != class_name:
+            continue
+        for child in node.body:
+            if not isinstance(child, ast.Assign):
+                continue
+            for target in child.targets:
+                if not isinstance(target, ast.Name):
+                    continue
+                try:
+                    attributes[target.id] = ast.literal_eval(child.value)
+                except (TypeError, ValueError):
+                    raise StaticExtractionError(
+                        "Cannot statically evaluate {}.{} in {}".format(
+                            class_name, target.id, filename,
+                        )
+                    )
+    return attributes
+
+
+class StaticFragment:
+    def __init__(self, name, attributes):
+        self.ansible_name = name
+        self.__dict__.update(attributes)
+
+
+def get_default_collection_paths():
+    paths = os.environ.get(
+        "ANSIBLE_COLLECTIONS_PATH",
+        os.environ.get("ANSIBLE_COLLECTIONS_PATHS"),
+    )
+    if paths is None:
+        paths = os.pathsep.join((
+            "~/.ansible/collections", "/usr/share/ansible/collections",
+        ))
+    result = [os.path.expanduser(p) for p in paths.split(os.pathsep) if p]
+    return result + [p for p in sys.path if p]
+
+
+def get_ansible_fragments_dir():
+    # Locating the package does not import it.
+    spec = importlib.util.find_spec("ansible")
+    if spec is None or not spec.submodule_search_locations:
+        return None
+    return os.path.join(
+        list(spec.submodule_search_locations)[0], "plugins", "doc_fragments",
+    )
+
+
+class StaticFragmentLoader:
+    """
+    Doc fragment loader that finds fragments on the collection search path
+    and reads them without importing them
+
+    Collections that the extracted modules belong to are found next to the
+    modules, either in an ansible_collections tree or in a folder with the
+    galaxy.yml file.
+    """
+
+    def __init__(self, collection_paths=None):
+        if collection_paths is None:
+            collection_paths = get_default_collection_paths()
+        self.collection_paths = collection_paths
+        self.collections = {}
+        self._builtin_dir = get_ansible_fragments_dir()
+        self._seen_dirs = set()
+
+    def add_module(self, module):
+        path = os.path.dirname(os.path.abspath(module))
+        while path not in self._seen_dirs:
+            self._seen_dirs.add(path)
+            parent = os.path.dirname(path)
+            grandparent = os.path.dirname(parent)
+            if os.path.basename(grandparent) == "ansible_collections":
+                name = "{}.{}".format(
+                    os.path.basename(parent), os.path.basename(path),
+                )
+                self.collections.setdefault(name, path)
+                return
+            galaxy = os.path.join(path, "galaxy.yml")
+            if os.path.isfile(galaxy):
+                with open(galaxy, "rb") as fd:
+                    info = load_yaml(fd.read(), galaxy) or {}
+                name = "{}.{}".format(info.get("namespace"), info.get("name"))
+                self.collections.setdefault(name, path)
+                return
+            if parent == path:
+                return
+            path = parent
+
+    def find_plugin(self, name):
+        parts = name.split(".")
+        if parts[:2] == ["ansible", "builtin"]:
+            parts = parts[2:]
+        if len(parts) == 1:
+            if self._builtin_dir is None:
+                return None
+            return self._find_file(self._builtin_dir, parts)
+        if len(parts) < 3:
+            return None
+
+        collection = ".".join(parts[:2])
+        roots = []
+        if collection in self.collections:
+            roots.append(self.collections[collection])
+        roots.extend(
+            os.path.join(path, "ansible_collections", *parts[:2])
+            for path in self.collection_paths
+        )
+        for root in roots:
+            path = self._find_file(
+                os.path.join(root, "plugins", "doc_fragments"), parts[2:],
+            )
+            if path is not None:
+                return path
+        return None
+
+    def _find_file(self, directory, parts):
+        path = os.path.join(directory, *parts) + ".py"
+        if os.path.isfile(path):
+            return path
+        return None
+
+    def get(self, name):
+        path = self.find_plugin(name)
+        if path is None:
+            return None
+        if name.count(".") < 2:
+            name = "ansible.builtin." + name
+        return StaticFragment(
+            name, read_class_attributes(path, "ModuleDocFragment"),
+        )
+
+
+def get_docstring(filename, fragment_cache):
+    """
+    Read plugin documentation without ansible and merge the doc fragments it
+    extends
+
+    Returns the same values as fragments.get_docstring.
+    """
+    fragment_cache.loader.add_module(filename)
+    data = read_docstring(filename)
+
+    fragments = []
+    if data.get("doc"):
+        with profiling.stage("fragments"):
+            fragments = add_fragments(data["doc"], filename, fragment_cache)
+
+    return (
+        data["doc"], data["plainexamples"], data["returndocs"],
+        data["metadata"], fragments,
+    )
@@ -0,0 +1,228 @@
+import collections
+import ctypes
+import ctypes.util
+import importlib
+import os
+import os.path
+import select
+import struct
+import sys
+import time
+import traceback
+
+from ansible_doc_extractor import render
+
+
+class PollingWatcher:
+    """
+    File watcher that periodically checks file modification times and sizes
+    """
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self._files = {}
+
+    def add(self, path):
+        if path not in self._files:
+            self._files[path] = self._stat(path)
+
+    def _stat(self, path):
+        try:
+            stat = os.stat(path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def wait(self):
+        while True:
+            time.sleep(self.interval)
+            changed = set()
+            for path, old_stat in self._files.items():
+                new_stat = self._stat(path)
+                if new_stat != old_stat:
+                    self._files[path] = new_stat
+                    changed.add(path)
+            if changed:
+                return changed
+
+
+class InotifyWatcher:
+    """
+    File watcher that uses Linux inotify
+
+    Directories that contain the watched files are watched instead of the
+    files themselves because many editors save files by replacing them.
+    """
+
+    # Flags from sys/inotify.h
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_CLOEXEC = 0o2000000
+    MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+    EVENT = struct.Struct("iIII")
+
+    # Events that arrive within this many seconds are handled together.
+    DEBOUNCE = 0.1
+
+    def __init__(self):
+        self._libc = ctypes.CDLL(
+            ctypes.util.find_library("c") or "libc.so.6", use_errno=True,
+        )
+        self._fd = self._libc.inotify_init1(self.IN_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self._dirs = {}
+        self._files = set()
+
+    def add(self, path):
+        self._files.add(path)
+        directory = os.path.dirname(path)
+        if directory in self._dirs.values():
+            return
+        wd = self._libc.inotify_add_watch(
+            self._fd, os.fsencode(directory), self.MASK,
+        )
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), directory)
+        self._dirs[wd] = directory
+
+    def _read_events(self):
+        data = os.read(self._fd, 64 * 1024)
+        offset = 0
+        while offset < len(data):
+            wd, _, _, length = self.EVENT.unpack_from(data, offset)
+            offset += self.EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if wd in self._dirs:
+                yield os.path.join(self._dirs[wd], os.fsdecode(name))
+
+    def wait(self):
+        while True:
+            changed = set(self._read_events())
+            while select.select([self._fd], [], [], self.DEBOUNCE)[0]:
+                changed.update(self._read_events())
+            changed &= self._files
+            if changed:
+                return changed
+
+
+def get_watcher():
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher()
+        except (AttributeError, OSError):
+            pass
+    return PollingWatcher()
+
+
+def reload_python_file(path):
+    # Ansible's plugin loader keeps imported doc fragments around, so they
+    # must be reloaded in place to pick up the changes.
+    for module in list(sys.modules.values()):
+        module_file = getattr(module, "__file__", None)
+        if module_file and os.path.abspath(module_file) == path:
+            importlib.reload(module)
+
+
+def refresh_fragments(fragment_cache):
+    """
+    Drop doc fragments that changed since they were parsed from the cache,
+    so that they are parsed again when they are used next
+    """
+    stale = fragment_cache.stale_paths()
+    if stale:
+        fragment_cache.forget(stale)
+        for path in stale:
+            reload_python_file(path)
+
+
+class DependencyIndex:
+    """
+    Reverse index from doc fragment files to modules that extend them
+    """
+
+    def __init__(self):
+        self._modules = collections.defaultdict(set)
+        self._fragments = {}
+
+    def update(self, module, fragments):
+        for fragment in self._fragments.get(module, ()):
+            self._modules[fragment].discard(module)
+        self._fragments[module] = {os.path.abspath(f) for f in fragments}
+        for fragment in self._fragments[module]:
+            self._modules[fragment].add(module)
+
+    def dependents(self, fragment):
+        return self._modules.get(fragment, set())
+
+    def fragments(self):
+        return {f for f, modules in self._modules.items() if modules}
+
+
+def render_affected(renderer, output, modules, index):
+    for module in modules:
+        try:
+            result = renderer.render(output, module)
+        except Exception:
+            traceback.print_exc()
+            continue
+        index.update(module, result["fragments"])
+
+
+def watch_docs(output, modules, custom_template, markdown, **kwargs):
+    """
+    Render documentation and re-render it whenever modules, doc fragments,
+    or the template change, until interrupted
+    """
+    template_path = None
+    if custom_template:
+        template_path = os.path.abspath(custom_template.name)
+    options = render.create_options(custom_template, markdown, **kwargs)
+    renderer = render.Renderer(options)
+
+    os.makedirs(output, exist_ok=True)
+    paths = {os.path.abspath(module): module for module in modules}
+    index = DependencyIndex()
+    render_affected(renderer, output, modules, index)
+
+    watcher = get_watcher()
+    for path in list(paths) + list(index.fragments()):
+        watcher.add(path)
+    if template_path is not None:
+        watcher.add(template_path)
+
+    print("Watching for changes. Press Ctrl+C to stop.")
+    try:
+        while True:
+            changed = watcher.wait()
+            affected = {paths[path] for path in changed if path in paths}
+
+            fragments = changed & index.fragments()
+            if fragments:
+                renderer.fragment_cache.forget(fragments)
+                for fragment in fragments:
+                    reload_python_file(fragment)
+                    affected.update(index.dependents(fragment))
+
+            if template_path in changed:
+                try:
+                    with open(template_path) as fd:
+                        options.template_source = fd.read()
+                    renderer.load_template()
+                except Exception:
+                    traceback.print_exc()
+                    continue
+                affected = set(modules)
+
+            render_affected(
+                renderer, output, [m for m in modules if m in affected], index,
+            )
+            for fragment in index.fragments():
+                watcher.add(fragment)
+    except KeyboardInterrupt:
+        pass
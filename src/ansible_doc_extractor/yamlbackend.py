@@ -0,0 +1,48 @@
+"""
+YAML parser selection
+
+PyYAML parses YAML either in pure Python or, when it was built with libyaml,
+with the several times faster CSafeLoader, which gives the same results. The
+backend is selected once per process and used by all YAML that the extractor
+parses itself: RETURN blocks that arrive as text, documentation and doc
+fragments read by the static engine, and galaxy.yml files. The ansible engine
+parses documentation with ansible's own loader, which uses libyaml on its
+own when it can.
+"""
+
+import yaml
+
+BACKENDS = ("auto", "libyaml", "python")
+
+HAS_LIBYAML = hasattr(yaml, "CSafeLoader")
+
+YAMLError = yaml.YAMLError
+
+
+def get_loader(backend):
+    if backend == "python":
+        return yaml.SafeLoader
+    if backend == "libyaml" and not HAS_LIBYAML:
+        raise ValueError("PyYAML was built without libyaml")
+    if backend not in BACKENDS:
+        raise ValueError("Unknown YAML backend {!r}".format(backend))
+    return yaml.CSafeLoader if HAS_LIBYAML else yaml.SafeLoader
+
+
+_loader = get_loader("auto")
+
+
+def configure(backend):
+    global _loader
+    _loader = get_loader(backend)
+
+
+def get_backend():
+    """
+    Return the name of the backend in use, libyaml or python
+    """
+    return "python" if _loader is yaml.SafeLoader else "libyaml"
+
+
+def safe_load(stream):
+    return yaml.load(stream, Loader=_loader)
@@ -0,0 +1,81 @@
+#!/bin/bash
+
+set -euo pipefail
+
+workdir=$(mktemp -d)
+trap "rm -rf $workdir" EXIT
+
+export ANSIBLE_COLLECTIONS_PATH=$(realpath ../doc_fragments)
+module=$(realpath ../basic/ad_auth_provider.py)
+
+# The API renders the same documents as the command line.
+for format in rst md; do
+  if [ $format = md ]; then markdown=--markdown; else markdown=; fi
+  ansible-doc-extractor $markdown "$workdir" "$module" > /dev/null
+
+  python - "$workdir/ad_auth_provider.$format" "$module" $format <<'PYTHON'
+import sys
+
+from ansible_doc_extractor.api import extract, render
+
+expected, module, output_format = sys.argv[1:]
+with open(expected) as fd:
+    expected = fd.read()
+for _ in range(2):
+    assert render(extract(module), output_format=output_format) == expected
+PYTHON
+done
+
+python -c "import sphinx" 2> /dev/null || exit 0
+
+# The Sphinx extension extracts modules once and again only when they change.
+# Sphinx only reads documents in parallel when there are more than five.
+mkdir "$workdir/docs"
+for i in $(seq 6); do
+  cp "$module" "$workdir/docs/module$i.py"
+  echo ".. ansible-module:: module$i.py" > "$workdir/docs/module$i.rst"
+done
+cat > "$workdir/docs/conf.py" <<'PYTHON'
+from ansible_doc_extractor import api
+
+extensions = ["ansible_doc_extractor.sphinxext"]
+
+extract_docs = api.extract_docs
+
+
+def log_extract_docs(path, *args):
+    with open("extracted.log", "a") as fd:
+        fd.write(path + "\n")
+    return extract_docs(path, *args)
+
+
+api.extract_docs = log_extract_docs
+PYTHON
+cat > "$workdir/docs/index.rst" <<'RST'
+Modules
+=======
+
+.. toctree::
+   :glob:
+
+   module*
+RST
+
+# Seealso entries reference modules that are not documented here, so
+# warnings are expected.
+build() {
+  (cd "$workdir/docs" && sphinx-build -q -j 2 . _build > /dev/null 2>&1)
+}
+
+build
+grep -q "ad_auth_provider" "$workdir/docs/_build/module1.html"
+test $(wc -l < "$workdir/docs/extracted.log") = 6
+
+# Touched modules are read again, but not extracted again.
+touch "$workdir/docs/module1.py"
+build
+test $(wc -l < "$workdir/docs/extracted.log") = 6
+
+echo "# changed" >> "$workdir/docs/module1.py"
+build
+test $(wc -l < "$workdir/docs/extracted.log") = 7
@@ -0,0 +1,63 @@
+#!/bin/bash
+
+set -euo pipefail
+
+workdir=$(mktemp -d)
+trap "rm -rf $workdir" EXIT
+
+export ANSIBLE_COLLECTIONS_PATH=$(realpath ../doc_fragments)
+collection=../doc_fragments/ansible_collections/sensu/sensu_go
+module=../basic/ad_auth_provider.py
+
+mkdir "$workdir/files"
+ansible-doc-extractor --collection $collection "$workdir/files" $module
+
+# Archives contain the same files as the output folder ...
+for format in tar tar.gz zip; do
+  ansible-doc-extractor --archive $format --collection $collection \
+    "$workdir/docs.$format" $module
+  mkdir "$workdir/$format"
+  python -m $([[ $format == zip ]] && echo zipfile || echo tarfile) \
+    -e "$workdir/docs.$format" "$workdir/$format"
+  diff -r "$workdir/files" "$workdir/$format"
+done
+
+# ... also when they are streamed to a pipe, which keeps stdout clean.
+ansible-doc-extractor --archive tar.gz --collection $collection - $module \
+  2> /dev/null | tar -xz -C "$workdir/tar.gz"
+diff -r "$workdir/files" "$workdir/tar.gz"
+ansible-doc-extractor --archive zip -j 1 - $module 2> /dev/null \
+  | cat > "$workdir/stdout.zip"
+python -m zipfile -t "$workdir/stdout.zip"
+
+# A slow reader pauses rendering, so rendered documents do not pile up in
+# memory. Progress messages tell how many modules were rendered while the
+# reader was not reading.
+mkdir "$workdir/modules"
+for i in $(seq 40); do
+  sed "s/^module: ad_auth_provider$/module: module$i/" $module \
+    > "$workdir/modules/module$i.py"
+done
+ansible-doc-extractor --archive tar -j 2 - "$workdir"/modules/*.py \
+  2> "$workdir/progress" | python -c '
+import sys
+import time
+
+time.sleep(3)
+with open(sys.argv[1]) as fd:
+    rendered = sum(line.startswith("Rendering ") for line in fd)
+assert rendered < 20, rendered
+sys.stdin.buffer.read()
+' "$workdir/progress"
+test $(grep -c "^Rendering " "$workdir/progress") = 40
+
+# Failed runs do not leave partial archives behind
+if ansible-doc-extractor --archive tar "$workdir/broken.tar" missing.py \
+    2> /dev/null; then
+  echo "Rendering a missing module succeeded"
+  exit 1
+fi
+if ls -A "$workdir" | grep -q "broken"; then
+  echo "Partial archive was left behind"
+  exit 1
+fi
@@ -3,3 +3,17 @@
 set -euo pipefail
 
 ansible-doc-extractor . ad_auth_provider.py
+
+# Rendering functions that used to live in the cli module keep working with
+# their old arguments.
+workdir=$(mktemp -d)
+trap "rm -rf $workdir" EXIT
+python - "$workdir" > /dev/null <<'PYTHON'
+import sys
+
+from ansible_doc_extractor import cli
+
+template, extension = cli.get_template(None, False)
+cli.render_module_docs(sys.argv[1], "ad_auth_provider.py", template, extension)
+PYTHON
+cmp ad_auth_provider.rst "$workdir/ad_auth_provider.rst"
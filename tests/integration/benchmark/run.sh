@@ -0,0 +1,41 @@
+#!/bin/bash
+
+set -euo pipefail
+
+workdir=$(mktemp -d)
+trap "rm -rf $workdir" EXIT
+
+bench="python ../../../benchmarks/bench.py --modules 3 --depth 1 --repeat 1"
+
+# The generated collection renders with both engines ...
+$bench --engine static -o "$workdir/static.json"
+$bench --markdown -o "$workdir/ansible.json"
+
+# ... and the results can be compared.
+$bench --markdown --baseline "$workdir/ansible.json" --threshold 1000
+
+python - "$workdir"/*.json <<'PYTHON'
+import json
+import sys
+
+for path in sys.argv[1:]:
+    with open(path) as fd:
+        results = json.load(fd)
+    stages = results["stages"]
+    for stage in "extract", "normalize", "markup", "render", "write":
+        if not 0 <= stages[stage] <= stages["total"]:
+            sys.exit("Invalid {} time in {}".format(stage, path))
+PYTHON
+
+# The YAML backends can be compared on large RETURN blocks.
+python ../../../benchmarks/yaml_backends.py --modules 2 --depth 1 \
+  --samples 5 --runs 1 -o "$workdir/yaml.json"
+python - "$workdir/yaml.json" <<'PYTHON'
+import json
+import sys
+
+with open(sys.argv[1]) as fd:
+    results = json.load(fd)["results"]
+if set(results) != {"python", "libyaml"}:
+    sys.exit("Missing YAML backends in {}".format(sys.argv[1]))
+PYTHON
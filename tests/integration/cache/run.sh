@@ -0,0 +1,109 @@
+#!/bin/bash
+
+set -euo pipefail
+
+workdir=$(mktemp -d)
+trap "rm -rf $workdir" EXIT
+
+cp -r ../doc_fragments/ansible_collections "$workdir"
+export ANSIBLE_COLLECTIONS_PATH=$workdir
+plugins=$workdir/ansible_collections/sensu/sensu_go/plugins
+
+function extract () {
+  ansible-doc-extractor --cache-dir "$workdir/cache" "$workdir" \
+    "$plugins"/modules/*.py > "$workdir/log"
+}
+
+# First run renders everything
+extract && grep -q "^Rendering" "$workdir/log"
+
+# Nothing changed, nothing to render
+extract && grep -q "^Skipping" "$workdir/log"
+
+# Changed doc fragment invalidates modules that use it
+echo "# changed" >> "$plugins/doc_fragments/auth.py"
+extract && grep -q "^Rendering" "$workdir/log"
+extract && grep -q "^Skipping" "$workdir/log"
+
+# Removed output is rendered again, with doc fragments parsed by the
+# previous run
+rm "$workdir/ad_auth_provider.rst"
+extract && grep -q "^Rendering" "$workdir/log"
+grep -q "^Doc fragment cache: 0 hits, [1-9][0-9]* disk hits, 0 misses" \
+  "$workdir/log"
+test -f "$workdir/ad_auth_provider.rst"
+
+# Unchanged output files are not rewritten
+touch -d 2000-01-01 "$workdir/ad_auth_provider.rst"
+ansible-doc-extractor --skip-unchanged "$workdir" "$plugins"/modules/*.py \
+  > "$workdir/log"
+grep -q "^Output files: 0 written, 1 unchanged" "$workdir/log"
+test "$(stat -c %Y "$workdir/ad_auth_provider.rst")" = "$(date -d 2000-01-01 +%s)"
+
+# Identical checkouts that share a cache directory each track their own doc
+# fragments.
+for checkout in first second; do
+  mkdir "$workdir/$checkout"
+  cp -r ../doc_fragments/ansible_collections "$workdir/$checkout"
+done
+function extract_checkout () {
+  ANSIBLE_COLLECTIONS_PATH=$workdir/$1 ansible-doc-extractor \
+    --cache-dir "$workdir/shared-cache" "$workdir/$1/out" \
+    "$workdir/$1"/ansible_collections/sensu/sensu_go/plugins/modules/*.py \
+    > "$workdir/log"
+}
+extract_checkout first
+extract_checkout second && grep -q "^Rendering" "$workdir/log"
+sed -i "s/The Sensu resource's name./The renamed resource's name./" \
+  "$workdir/second/ansible_collections/sensu/sensu_go/plugins/doc_fragments/name.py"
+extract_checkout second && grep -q "^Rendering" "$workdir/log"
+grep -q "The renamed resource's name." "$workdir/second/out/ad_auth_provider.rst"
+
+# Compiled templates are loaded from the template cache by later runs, which
+# render the same output.
+export XDG_CACHE_HOME=$workdir/xdg
+ansible-doc-extractor --format rst --format md "$workdir/compiled" \
+  "$plugins"/modules/*.py > /dev/null
+ls "$XDG_CACHE_HOME"/ansible-doc-extractor/templates/jinja2-*/*.cache \
+  > /dev/null
+python - "$workdir/cached-templates" "$plugins"/modules/*.py <<'PYTHON'
+import sys
+
+import jinja2
+
+from ansible_doc_extractor import render
+
+compiled = []
+compile_template = jinja2.Environment.compile
+
+
+def log_compile(self, source, name=None, *args, **kwargs):
+    # Ansible compiles unnamed templates of its own.
+    if name is not None:
+        compiled.append(name)
+    return compile_template(self, source, name, *args, **kwargs)
+
+
+jinja2.Environment.compile = log_compile
+render.render_docs(
+    sys.argv[1], sys.argv[2:], None, False, jobs=1, formats=["rst", "md"],
+)
+assert compiled == [], compiled
+
+# Templates compiled in a different environment are kept apart.
+cache_dir = render.get_template_cache_dir()
+render.ENVIRONMENT_OPTIONS["lstrip_blocks"] = True
+assert render.get_template_cache_dir() != cache_dir
+PYTHON
+diff -r "$workdir/compiled" "$workdir/cached-templates"
+
+# The tool version is found without importlib.metadata, as on Python 3.7.
+python - <<'PYTHON'
+import sys
+
+sys.modules["importlib.metadata"] = None
+
+from ansible_doc_extractor import cache
+
+assert cache.get_tool_version() != "unknown"
+PYTHON
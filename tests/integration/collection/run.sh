@@ -0,0 +1,116 @@
+#!/bin/bash
+
+set -euo pipefail
+
+workdir=$(mktemp -d)
+trap "rm -rf $workdir" EXIT
+
+collection=$workdir/ansible_collections/sensu/sensu_go
+cp -r ../doc_fragments/ansible_collections "$workdir"
+export ANSIBLE_COLLECTIONS_PATH=$workdir
+
+mkdir -p "$collection/plugins/modules/nested" "$collection/plugins/lookup" \
+  "$collection/plugins/filter" "$collection/plugins/module_utils"
+mv "$collection/plugins/modules/ad_auth_provider.py" \
+  "$collection/plugins/modules/nested/"
+ln -s nested/ad_auth_provider.py "$collection/plugins/modules/ad_alias.py"
+touch "$collection/plugins/modules/__init__.py" \
+  "$collection/plugins/module_utils/client.py"
+
+cat > "$collection/plugins/lookup/backends.py" <<'PYTHON'
+DOCUMENTATION = """
+name: backends
+author: Sensu
+short_description: List backends
+description:
+  - Return backends. See M(sensu.sensu_go.ad_auth_provider) and
+    L(docs,https://docs.sensu.io).
+options:
+  _terms:
+    description: Backend names.
+    type: list
+"""
+
+EXAMPLES = """
+- debug:
+    msg: "{{ lookup('sensu.sensu_go.backends') }}"
+"""
+
+RETURN = """
+_raw:
+  description: Backends.
+  type: list
+"""
+PYTHON
+
+cat > "$collection/plugins/filter/core.py" <<'PYTHON'
+class FilterModule:
+    def filters(self):
+        return dict(double=lambda x: 2 * x)
+PYTHON
+
+cat > "$collection/plugins/filter/double.yml" <<'YAML'
+DOCUMENTATION:
+  name: double
+  author: Sensu
+  short_description: Double a number
+  description: Multiply the input by two, see P(sensu.sensu_go.backends#lookup).
+  options:
+    _input:
+      description: Number.
+      type: int
+      required: true
+EXAMPLES: |
+  doubled: "{{ 2 | sensu.sensu_go.double }}"
+RETURN:
+  _value:
+    description: Doubled number.
+    type: int
+YAML
+
+expected="filter/double.rst lookup/backends.rst module/ad_auth_provider.rst"
+for engine in ansible static; do
+  ansible-doc-extractor --engine $engine --collection "$collection" "$workdir/$engine"
+  actual=$(cd "$workdir/$engine" && find . -type f | sed 's|^\./||' | sort | xargs)
+  if [[ "$actual" != "$expected" ]]; then
+    echo "Unexpected output files for $engine engine: $actual"
+    exit 1
+  fi
+done
+diff -r "$workdir/ansible" "$workdir/static"
+
+python - "$collection" <<'PYTHON'
+import sys
+
+from ansible_doc_extractor import collection, render
+
+root = sys.argv[1]
+assert collection.get_collection_name(root) == "sensu.sensu_go"
+plugins = collection.find_plugins(root)
+assert [t for t, _ in plugins] == ["filter", "lookup", "module"], plugins
+
+cache = render.get_fragment_cache("static")
+for plugin_type, path in plugins:
+    doc, _ = render.extract_module_docs(
+        path, cache, "static", plugin_type, "sensu.sensu_go",
+    )
+    assert doc["plugin_type"] == plugin_type
+    assert doc["collection"] == "sensu.sensu_go"
+PYTHON
+
+if ansible-doc-extractor --collection "$workdir" "$workdir/out" 2> "$workdir/err"; then
+  echo "Directory without plugins was accepted as a collection"
+  exit 1
+fi
+grep -q "missing plugins directory" "$workdir/err"
+
+# Files without documentation in plugin directories are reported by name.
+echo "X = 1" > "$collection/plugins/lookup/helper.py"
+for engine in ansible static; do
+  if ansible-doc-extractor --engine $engine --collection "$collection" \
+      "$workdir/undocumented" 2> "$workdir/err"; then
+    echo "Plugin without documentation was accepted by $engine engine"
+    exit 1
+  fi
+  grep -q "error: .*/lookup/helper.py has no documentation" "$workdir/err"
+done
@@ -0,0 +1,52 @@
+#!/bin/bash
+
+set -euo pipefail
+
+workdir=$(mktemp -d)
+trap "rm -rf $workdir" EXIT
+
+export ANSIBLE_COLLECTIONS_PATH=$(realpath ../doc_fragments)
+collection=../doc_fragments/ansible_collections/sensu/sensu_go
+module=../basic/ad_auth_provider.py
+
+ansible-doc-extractor --collection $collection "$workdir/direct" $module
+ansible-doc-extractor --markdown "$workdir/direct-md" $module
+
+# Rendering from a dump gives the same documents as rendering right away,
+# and dump directories keep the plugin type subfolders.
+for format in json msgpack; do
+  ansible-doc-extractor --dump-$format --collection $collection \
+    "$workdir/$format" $module
+  ansible-doc-extractor --from-json "$workdir/$format-rst" "$workdir/$format"
+  diff -r "$workdir/direct" "$workdir/$format-rst"
+
+  ansible-doc-extractor --from-json --markdown "$workdir/$format-md" \
+    "$workdir/$format/ad_auth_provider.$format"
+  diff -r "$workdir/direct-md" "$workdir/$format-md"
+done
+
+# Rendering from a dump does not import ansible.
+python - "$workdir" <<'PYTHON'
+import os
+import sys
+
+from ansible_doc_extractor import render
+
+render.render_docs(
+    os.path.join(sys.argv[1], "no-ansible"), [os.path.join(sys.argv[1], "json")],
+    None, False, jobs=1, engine=render.DUMP_ENGINE,
+)
+imported = [m for m in sys.modules if m.split(".")[0] == "ansible"]
+if imported:
+    sys.exit("Ansible modules were imported: {}".format(", ".join(imported)))
+PYTHON
+diff -r "$workdir/direct" "$workdir/no-ansible"
+
+# Broken dumps are reported without a traceback.
+echo '{"doc": {}}' > "$workdir/broken.json"
+if ansible-doc-extractor --from-json "$workdir/out" "$workdir/broken.json" \
+    2> "$workdir/error"; then
+  echo "Rendering a broken dump succeeded"
+  exit 1
+fi
+grep -q "is not a documentation dump" "$workdir/error"
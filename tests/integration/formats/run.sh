@@ -0,0 +1,54 @@
+#!/bin/bash
+
+set -euo pipefail
+
+workdir=$(mktemp -d)
+trap "rm -rf $workdir" EXIT
+
+export ANSIBLE_COLLECTIONS_PATH=$(realpath ../doc_fragments)
+collection=../doc_fragments/ansible_collections/sensu/sensu_go
+module=../basic/ad_auth_provider.py
+
+cat > "$workdir/site.j2" <<'TEMPLATE'
+<h1>{{ module }}</h1>
+<p>{{ short_description }}</p>
+TEMPLATE
+
+ansible-doc-extractor --collection $collection "$workdir/rst" $module
+ansible-doc-extractor --collection $collection --markdown "$workdir/md" $module
+
+# Each output is rendered into its own subfolder, with the same documents
+# as separate runs for each format give.
+for jobs in 1 2; do
+  ansible-doc-extractor -j $jobs --collection $collection "$workdir/multi-$jobs" \
+    --format rst --format md --template "$workdir/site.j2:html" $module
+  diff -r "$workdir/rst" "$workdir/multi-$jobs/rst"
+  diff -r "$workdir/md" "$workdir/multi-$jobs/md"
+  grep -q "<h1>ad_auth_provider</h1>" \
+    "$workdir/multi-$jobs/html/module/ad_auth_provider.html"
+done
+
+# Modules are rendered again when any of their outputs is missing.
+ansible-doc-extractor --cache-dir "$workdir/cache" "$workdir/cached" \
+  --format md --template "$workdir/site.j2:html" $module
+ansible-doc-extractor --cache-dir "$workdir/cache" "$workdir/cached" \
+  --format md --template "$workdir/site.j2:html" $module \
+  | grep "Skipping" > /dev/null
+rm "$workdir/cached/html/ad_auth_provider.html"
+ansible-doc-extractor --cache-dir "$workdir/cache" "$workdir/cached" \
+  --format md --template "$workdir/site.j2:html" $module \
+  | grep "Rendering" > /dev/null
+test -f "$workdir/cached/html/ad_auth_provider.html"
+
+# Archives contain the subfolders as well.
+ansible-doc-extractor --archive tar "$workdir/docs.tar" \
+  --format rst --format md $module
+[[ $(tar -tf "$workdir/docs.tar" | sort | tr '\n' ' ') \
+  == "md/ad_auth_provider.md rst/ad_auth_provider.rst " ]]
+
+# Outputs cannot share a folder.
+if ansible-doc-extractor "$workdir/clash" --format md \
+    --template "$workdir/site.j2:md" $module > /dev/null 2>&1; then
+  echo "Outputs with the same extension were accepted"
+  exit 1
+fi
@@ -0,0 +1,67 @@
+#!/bin/bash
+
+set -euo pipefail
+
+workdir=$(mktemp -d)
+trap "rm -rf $workdir" EXIT
+
+export ANSIBLE_COLLECTIONS_PATH=$(realpath ../doc_fragments)
+collection=../doc_fragments/ansible_collections/sensu/sensu_go
+module=../basic/ad_auth_provider.py
+
+cat > "$workdir/old_module.py" <<'MODULE'
+DOCUMENTATION = r"""
+module: old_module
+author: Tester (@tester)
+short_description: Replaced by O(new_module)
+description: Old module.
+deprecated:
+  removed_at_date: 2030-01-01
+  why: Replaced.
+  alternative: Use new_module.
+"""
+MODULE
+
+# Index pages link to every plugin and mark deprecated ones.
+ansible-doc-extractor --index --collection $collection "$workdir/docs" \
+  $module "$workdir/old_module.py" > /dev/null
+grep -q "^sensu.sensu_go plugin index$" "$workdir/docs/index.rst"
+grep -q ":doc:\`ad_auth_provider <module/ad_auth_provider>\`" \
+  "$workdir/docs/index.rst"
+grep -q ":doc:\`old_module <old_module>\`.*(deprecated)$" \
+  "$workdir/docs/index.rst"
+grep -q "^   module/ad_auth_provider$" "$workdir/docs/index.rst"
+
+# Each output gets its own index page, custom templates only with an index
+# template of their own.
+cat > "$workdir/index.html.j2" <<'TEMPLATE'
+{% for plugin in plugins %}
+<a href="{{ plugin.path }}">{{ plugin.name }}</a>
+{% endfor %}
+TEMPLATE
+cat > "$workdir/site.j2" <<'TEMPLATE'
+<h1>{{ module }}</h1>
+TEMPLATE
+ansible-doc-extractor "$workdir/multi" --format md --format rst \
+  --template "$workdir/site.j2:html" --template "$workdir/site.j2:txt" \
+  --index-template "$workdir/index.html.j2:html" $module > /dev/null
+grep -q "(ad_auth_provider.md)" "$workdir/multi/md/index.md"
+grep -q '<a href="ad_auth_provider.html">' "$workdir/multi/html/index.html"
+test ! -e "$workdir/multi/txt/index.txt"
+
+# Modules skipped by the incremental build stay in the index.
+for _ in 1 2; do
+  ansible-doc-extractor --index --cache-dir "$workdir/cache" \
+    "$workdir/cached" $module "$workdir/old_module.py" > /dev/null
+done
+grep -q "old_module <old_module>" "$workdir/cached/index.rst"
+grep -q "ad_auth_provider <ad_auth_provider>" "$workdir/cached/index.rst"
+
+# Collections without plugins still get an index page.
+cp -r ../doc_fragments/ansible_collections "$workdir"
+rm "$workdir"/ansible_collections/sensu/sensu_go/plugins/modules/*.py
+ansible-doc-extractor --index --format rst --format md \
+  --collection "$workdir/ansible_collections/sensu/sensu_go" \
+  "$workdir/empty" > /dev/null
+test -f "$workdir/empty/rst/index.rst"
+test -f "$workdir/empty/md/index.md"
@@ -0,0 +1,16 @@
+#!/bin/bash
+
+set -euo pipefail
+
+workdir=$(mktemp -d)
+trap "rm -rf $workdir" EXIT
+
+mkdir "$workdir/modules" "$workdir/serial" "$workdir/parallel"
+for i in $(seq 1 8); do
+  sed "s/^module: ad_auth_provider/module: ad_auth_provider_$i/" \
+    ../basic/ad_auth_provider.py > "$workdir/modules/ad_auth_provider_$i.py"
+done
+
+ansible-doc-extractor --jobs 1 "$workdir/serial" "$workdir"/modules/*.py
+ansible-doc-extractor --jobs 4 "$workdir/parallel" "$workdir"/modules/*.py
+diff -r "$workdir/serial" "$workdir/parallel"
@@ -0,0 +1,56 @@
+#!/bin/bash
+
+set -euo pipefail
+
+workdir=$(mktemp -d)
+trap "rm -rf $workdir" EXIT
+
+cp -r ../doc_fragments/ansible_collections "$workdir"
+export ANSIBLE_COLLECTIONS_PATH=$workdir
+collection=$workdir/ansible_collections/sensu/sensu_go
+rm "$collection"/plugins/modules/*.py
+
+# Both modules extend a fragment that refers to an option of the documented
+# plugin, which each module renders as a reference to itself.
+cat > "$collection/plugins/doc_fragments/wait.py" <<'PYTHON'
+class ModuleDocFragment(object):
+    DOCUMENTATION = """
+options:
+  wait:
+    description:
+      - Wait until O(name) exists.
+      - Plain text shared by all modules.
+    type: bool
+"""
+PYTHON
+for name in first second; do
+  cat > "$collection/plugins/modules/$name.py" <<PYTHON
+DOCUMENTATION = """
+module: $name
+author: Tester (@tester)
+short_description: The $name module
+description: The $name module.
+extends_documentation_fragment: sensu.sensu_go.wait
+options:
+  name:
+    description: Name.
+    type: str
+"""
+PYTHON
+done
+
+for size in 8192 0; do
+  ansible-doc-extractor -j 1 --markup-cache-size $size --format rst \
+    --format md --collection "$collection" "$workdir/$size" > "$workdir/log"
+  for name in first second; do
+    grep -q "^ *Wait until .*<ansible_collections.sensu.sensu_go.${name}_module>" \
+      "$workdir/$size/rst/module/$name.rst"
+  done
+done
+diff -r "$workdir/8192" "$workdir/0"
+
+# Text without O() and RV() (the "Name." and "Plain text" descriptions) is
+# converted once for both modules, the rest once per module.
+ansible-doc-extractor -j 1 --format rst --collection "$collection" \
+  "$workdir/stats" > "$workdir/log"
+grep -q "^Markup cache: 2 hits, 8 misses" "$workdir/log"
@@ -0,0 +1,74 @@
+#!/bin/bash
+
+set -euo pipefail
+
+export ANSIBLE_COLLECTIONS_PATH=$(realpath ../doc_fragments)
+
+# Templates see option and return value specs that behave like the plain
+# dictionaries that they used to get.
+python - <<'PYTHON'
+import difflib
+import sys
+
+import yaml
+
+from ansible_doc_extractor import model, render
+
+TEMPLATE = """
+{% for name, spec in options.items() %}
+{{ name }}: {{ spec.type }} {{ spec['type'] }} {{ spec.get('required', 'opt') }}
+{{ 'default' in spec }} {{ spec.keys() | list }} {{ spec | length }}
+{{ spec.aliases | default([]) }} {{ spec.no_log | default('-') }}
+{{ spec | tojson }}
+{{ spec }}
+{% endfor %}
+{{ options | to_yaml }}
+{{ returndocs | dictsort | length }}
+"""
+
+MODULE = (
+    "../doc_fragments/ansible_collections/sensu/sensu_go/plugins/modules/"
+    "ad_auth_provider.py"
+)
+
+
+def convert_descriptions(data):
+    for definition in data.values():
+        if "description" in definition:
+            definition["description"] = model.ensure_list(
+                definition["description"]
+            )
+        for key in "suboptions", "contains":
+            if key in definition:
+                convert_descriptions(definition[key])
+
+
+render.init_ansible()
+template, _ = render.load_template(TEMPLATE, False)
+
+doc, _ = render.extract_module_docs(MODULE, render.get_fragment_cache("ansible"))
+actual = template.render(doc)
+
+doc, examples, returndocs, metadata, _ = render.get_docstring(
+    MODULE, render.get_fragment_cache("ansible"), "ansible",
+)
+if isinstance(returndocs, str):
+    returndocs = yaml.safe_load(returndocs)
+doc.update(examples=examples, returndocs=returndocs, metadata=metadata)
+convert_descriptions(doc["options"])
+convert_descriptions(doc["returndocs"])
+expected = template.render(doc)
+
+if actual != expected:
+    sys.exit("\n".join(difflib.unified_diff(
+        expected.splitlines(), actual.splitlines(), lineterm="",
+    )))
+
+# Nesting depth is not limited by the recursion limit
+options = current = {}
+for _ in range(2 * sys.getrecursionlimit()):
+    current["nested"] = dict(description="Nested.", suboptions={})
+    current = current["nested"]["suboptions"]
+specs = model.build_specs(options)
+assert specs["nested"].description == ["Nested."]
+PYTHON
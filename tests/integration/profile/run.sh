@@ -0,0 +1,54 @@
+#!/bin/bash
+
+set -euo pipefail
+
+workdir=$(mktemp -d)
+trap "rm -rf $workdir" EXIT
+
+export ANSIBLE_COLLECTIONS_PATH=$(realpath ../doc_fragments)
+modules="
+  ../basic/ad_auth_provider.py
+  ../doc_fragments/ansible_collections/sensu/sensu_go/plugins/modules/ad_auth_provider.py
+"
+
+for jobs in 1 2; do
+  mkdir -p "$workdir/$jobs"
+  ansible-doc-extractor --jobs $jobs --profile-json "$workdir/profile.json" \
+    --profile-trace "$workdir/trace.json" "$workdir/$jobs" $modules \
+    > "$workdir/log"
+  grep -q "^Profile: 2 modules" "$workdir/log"
+  grep -q "Slowest modules" "$workdir/log"
+
+  python - "$workdir" <<'PYTHON'
+import json
+import os
+import sys
+
+workdir = sys.argv[1]
+with open(os.path.join(workdir, "profile.json")) as fd:
+    profile = json.load(fd)
+with open(os.path.join(workdir, "trace.json")) as fd:
+    trace = json.load(fd)
+
+stages = {"docstring", "fragments", "normalize", "markup", "render", "write"}
+if not stages <= set(profile["stages"]):
+    sys.exit("Missing stages: {}".format(stages - set(profile["stages"])))
+
+for module, data in profile["modules"].items():
+    total = sum(stage["wall"] for stage in data["stages"].values())
+    if abs(total - data["wall"]) > 1e-6:
+        sys.exit("Stage times of {} do not add up".format(module))
+
+names = {event["name"] for event in trace["traceEvents"]}
+if "ad_auth_provider.py" not in names or "render" not in names:
+    sys.exit("Missing trace events: {}".format(names))
+if any(event["ph"] != "X" or event["dur"] < 0 for event in trace["traceEvents"]):
+    sys.exit("Invalid trace events")
+PYTHON
+done
+
+# Profiling does not change the output
+diff -r "$workdir/1" "$workdir/2"
+mkdir "$workdir/plain"
+ansible-doc-extractor "$workdir/plain" $modules > /dev/null
+diff -r "$workdir/1" "$workdir/plain"
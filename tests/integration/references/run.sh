@@ -0,0 +1,74 @@
+#!/bin/bash
+
+set -euo pipefail
+
+workdir=$(mktemp -d)
+trap "rm -rf $workdir" EXIT
+
+collection="$workdir/ansible_collections/demo/refs"
+mkdir -p "$collection/plugins/modules" "$collection/plugins/lookup"
+
+cat > "$collection/plugins/modules/first.py" <<'MODULE'
+DOCUMENTATION = r"""
+module: first
+author: Tester (@tester)
+short_description: Uses M(demo.refs.second) and M(demo.refs.missing)
+description:
+  - Reads P(demo.refs.items#lookup) but not P(demo.refs.gone#lookup).
+  - Works like M(ansible.builtin.copy).
+options:
+  path:
+    description: Same as in M(demo.refs.second), see P(demo.refs.second#lookup).
+    type: str
+seealso:
+  - module: demo.refs.second
+  - module: demo.refs.third
+  - plugin: demo.refs.items
+    plugin_type: lookup
+"""
+MODULE
+
+cat > "$collection/plugins/modules/second.py" <<'MODULE'
+DOCUMENTATION = r"""
+module: second
+author: Tester (@tester)
+short_description: Second module
+description: Refers back to M(demo.refs.first).
+"""
+MODULE
+
+cat > "$collection/plugins/lookup/items.py" <<'PLUGIN'
+DOCUMENTATION = r"""
+name: items
+author: Tester (@tester)
+short_description: Items
+description: Items.
+"""
+PLUGIN
+
+export ANSIBLE_COLLECTIONS_PATH=$workdir
+
+expected="\
+Broken reference in $collection/plugins/modules/first.py: M(demo.refs.missing)
+Broken reference in $collection/plugins/modules/first.py: P(demo.refs.gone#lookup)
+Broken reference in $collection/plugins/modules/first.py: P(demo.refs.second#lookup)
+Broken reference in $collection/plugins/modules/first.py: seealso module demo.refs.third
+References: 10 checked, 4 broken"
+
+# Only references into the documented collection that do not exist are
+# reported, no matter how the plugins are passed.
+for args in "--collection $collection" \
+    "$collection/plugins/modules/first.py $collection/plugins/modules/second.py $collection/plugins/lookup/items.py"; do
+  ansible-doc-extractor --check-references -j 2 "$workdir/docs" $args \
+    | grep "^Broken\|^References" > "$workdir/report"
+  diff <(echo "$expected") "$workdir/report"
+done
+
+# Skipped modules are checked from the build cache.
+for _ in 1 2; do
+  ansible-doc-extractor --check-references --cache-dir "$workdir/cache" \
+    --collection $collection "$workdir/cached" \
+    | grep "^Broken\|^References\|^Skipping" > "$workdir/report"
+done
+grep -q "^Skipping $collection/plugins/modules/first.py" "$workdir/report"
+diff <(echo "$expected") <(grep -v "^Skipping" "$workdir/report")
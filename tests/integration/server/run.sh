@@ -0,0 +1,62 @@
+#!/bin/bash
+
+set -euo pipefail
+
+workdir=$(mktemp -d)
+export ANSIBLE_COLLECTIONS_PATH=$(realpath ../doc_fragments)
+module=$ANSIBLE_COLLECTIONS_PATH/ansible_collections/sensu/sensu_go/plugins/modules/ad_auth_provider.py
+
+ansible-doc-extractor-server "$workdir/socket" > "$workdir/log" &
+server=$!
+trap "kill $server; rm -rf $workdir" EXIT
+
+for _ in $(seq 50); do
+  test -S "$workdir/socket" && break
+  sleep 0.1
+done
+
+for format in rst md; do
+  if [ $format = md ]; then markdown=--markdown; else markdown=; fi
+  ansible-doc-extractor $markdown "$workdir" "$module"
+
+  python - "$workdir" "$module" $format <<'PYTHON'
+import os
+import sys
+
+from ansible_doc_extractor import server
+
+workdir, module, output_format = sys.argv[1:]
+for _ in range(2):
+    response = server.request(
+        os.path.join(workdir, "socket"), module, output_format,
+    )
+    assert "error" not in response, response["error"]
+    assert set(response["timing"]) == {"prepare", "extract", "render", "total"}
+
+path = os.path.join(workdir, "{}.{}".format(response["name"], output_format))
+with open(path) as fd:
+    assert fd.read() == response["text"], "Server output differs"
+PYTHON
+done
+
+# Clients that keep their connections open do not block other clients.
+python - "$workdir/socket" "$module" <<'PYTHON'
+import json
+import socket
+import sys
+
+from ansible_doc_extractor import server
+
+socket_path, module = sys.argv[1:]
+with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+    sock.connect(socket_path)
+    with sock.makefile("rwb") as stream:
+        stream.write(json.dumps(dict(module=module)).encode("utf-8") + b"\n")
+        stream.flush()
+        assert "error" not in json.loads(stream.readline())
+
+        # The first connection stays open while the second client renders.
+        socket.setdefaulttimeout(5)
+        response = server.request(socket_path, module, "md")
+        assert "error" not in response, response["error"]
+PYTHON
@@ -0,0 +1,93 @@
+#!/bin/bash
+
+set -euo pipefail
+
+workdir=$(mktemp -d)
+trap "rm -rf $workdir" EXIT
+
+export ANSIBLE_COLLECTIONS_PATH=$(realpath ../doc_fragments)
+collection=../doc_fragments/ansible_collections/sensu/sensu_go
+
+# Modules of different sizes, so that shards are balanced by cost. The
+# last one is larger than all others together.
+mkdir "$workdir/modules"
+for i in $(seq 9); do
+  lines=$((i * 100))
+  if [ $i = 9 ]; then lines=20000; fi
+  sed "s/^module: ad_auth_provider$/module: module$i/" \
+    ../basic/ad_auth_provider.py > "$workdir/modules/module$i.py"
+  printf '# padding\n%.0s' $(seq $lines) >> "$workdir/modules/module$i.py"
+done
+modules=$(ls "$workdir"/modules/*.py)
+
+ansible-doc-extractor -j 1 --index --format rst --format md \
+  --collection $collection "$workdir/single" $modules > /dev/null
+
+# Each module is rendered by exactly one of the shards, and shards of the
+# same run produce the output of a single run once merged.
+for shard in 1 2 3; do
+  ansible-doc-extractor -j 1 --shard $shard/3 --index --format rst \
+    --format md --collection $collection "$workdir/sharded" $modules \
+    > "$workdir/shard$shard.log"
+done
+test -e "$workdir/sharded/ansible-doc-extractor-shard-3-of-3.json"
+cat "$workdir"/shard*.log | grep "^Rendering " | sort > "$workdir/rendered"
+test $(wc -l < "$workdir/rendered") = 10
+test $(uniq < "$workdir/rendered" | wc -l) = 10
+
+# The largest module gets a shard of its own.
+grep -q "^Shard 1 of 3: 1 of 10 modules$" "$workdir/shard1.log"
+grep -q "^Rendering .*module9.py$" "$workdir/shard1.log"
+
+ansible-doc-extractor --merge-shards --index --format rst --format md \
+  "$workdir/sharded" > "$workdir/merge.log"
+grep -q "^Merged 3 shards with 10 plugins$" "$workdir/merge.log"
+diff -r "$workdir/single" "$workdir/sharded"
+
+# Recorded timings take precedence over file sizes.
+python - "$workdir/timings.json" $modules <<'PYTHON'
+import json
+import sys
+
+modules = {
+    module: dict(wall=100.0 if module.endswith("module1.py") else 1.0)
+    for module in sys.argv[2:]
+}
+with open(sys.argv[1], "w") as fd:
+    json.dump(dict(modules=modules), fd)
+PYTHON
+ansible-doc-extractor -j 1 --shard 1/3 --shard-timings "$workdir/timings.json" \
+  "$workdir/timed" $modules > "$workdir/timed.log"
+grep -q "^Shard 1 of 3: 1 of 9 modules$" "$workdir/timed.log"
+grep -q "^Rendering .*module1.py$" "$workdir/timed.log"
+
+# Merging needs the manifests of all shards.
+ansible-doc-extractor -j 1 --shard 1/2 --index "$workdir/partial" $modules \
+  > /dev/null
+if ansible-doc-extractor --merge-shards --index "$workdir/partial" \
+    2> "$workdir/err"; then
+  echo "Shards were merged with a missing shard"
+  exit 1
+fi
+grep -q "Missing manifests of shards 2 of 2" "$workdir/err"
+
+# Shards without modules still write their manifests, which are merged like
+# the others.
+module=../basic/ad_auth_provider.py
+ansible-doc-extractor --index --format rst --format md "$workdir/one" \
+  $module > /dev/null
+for shard in 1 2 3; do
+  ansible-doc-extractor --shard $shard/3 --index --format rst --format md \
+    "$workdir/few" $module > "$workdir/few$shard.log"
+done
+grep -q "^Shard 3 of 3: 0 of 1 modules$" "$workdir/few3.log"
+ansible-doc-extractor --merge-shards --index --format rst --format md \
+  "$workdir/few" > /dev/null
+diff -r "$workdir/one" "$workdir/few"
+
+# Also when no shard rendered into the output folders.
+for shard in 2 3; do
+  ansible-doc-extractor --shard $shard/3 --index --format rst --format md \
+    "$workdir/empty" $module > /dev/null
+done
+test -e "$workdir/empty/ansible-doc-extractor-shard-3-of-3.json"
@@ -0,0 +1,48 @@
+#!/bin/bash
+
+set -euo pipefail
+
+# Argument parsing must not import any of the heavy dependencies.
+python - > /dev/null <<'PYTHON'
+import sys
+
+from ansible_doc_extractor import cli
+
+try:
+    cli.create_argument_parser().parse_args(["--help"])
+except SystemExit:
+    pass
+
+heavy = sorted(
+    name for name in sys.modules
+    if name.split(".")[0] in ("ansible", "antsibull_docs_parser", "jinja2", "yaml")
+)
+if heavy:
+    sys.exit("Heavy modules imported at startup: {}".format(", ".join(heavy)))
+PYTHON
+
+# Guard against startup time regressions of --help and argument errors.
+python - <<'PYTHON'
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+limit = float(os.environ.get("STARTUP_TIME_LIMIT", "0.25"))
+
+for args in ["--help"], ["--jobs", "0"]:
+    timings = []
+    for _ in range(10):
+        start = time.perf_counter()
+        subprocess.run(
+            ["ansible-doc-extractor"] + args,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        timings.append(time.perf_counter() - start)
+
+    median = statistics.median(timings)
+    print("ansible-doc-extractor {}: {:.3f}s".format(" ".join(args), median))
+    if median > limit:
+        sys.exit("Startup took longer than {:.3f}s".format(limit))
+PYTHON
@@ -0,0 +1,35 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+DOCUMENTATION = """
+module: builtin_fragment
+short_description: Module that extends doc fragments from ansible-core
+description:
+  - Manage a file.
+author:
+  - XLAB Steampunk
+extends_documentation_fragment:
+  - files
+  - action_common_attributes
+options:
+  path:
+    description:
+      - Path to the file.
+    type: path
+    required: true
+"""
+
+EXAMPLES = """
+- name: Manage a file
+  builtin_fragment:
+    path: /tmp/file
+    mode: "0644"
+"""
+
+RETURN = """
+path:
+  description: Path to the file.
+  returned: always
+  type: str
+  sample: /tmp/file
+"""
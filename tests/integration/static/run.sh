@@ -0,0 +1,49 @@
+#!/bin/bash
+
+set -euo pipefail
+
+workdir=$(mktemp -d)
+trap "rm -rf $workdir" EXIT
+
+export ANSIBLE_COLLECTIONS_PATH=$(realpath ../doc_fragments)
+modules="
+  ../basic/ad_auth_provider.py
+  ../doc_fragments/ansible_collections/sensu/sensu_go/plugins/modules/ad_auth_provider.py
+  builtin_fragment.py
+"
+
+# Both engines must produce the same documentation data ...
+python - $modules <<'PYTHON'
+import sys
+
+from ansible_doc_extractor import render
+
+render.init_ansible()
+caches = {
+    engine: render.get_fragment_cache(engine) for engine in render.ENGINES
+}
+for module in sys.argv[1:]:
+    expected, actual = (
+        render.get_docstring(module, caches[engine], engine)
+        for engine in render.ENGINES
+    )
+    if expected != actual:
+        sys.exit("Static engine extracted different data from {}".format(module))
+PYTHON
+
+# ... and the same output.
+for module in $modules; do
+  for engine in ansible static; do
+    mkdir -p "$workdir/$engine"
+    ansible-doc-extractor --engine $engine "$workdir/$engine" "$module"
+  done
+  diff -r "$workdir/ansible" "$workdir/static"
+done
+
+# Both YAML backends parse the same documentation.
+for backend in python libyaml; do
+  mkdir -p "$workdir/$backend"
+  ansible-doc-extractor --engine static --yaml-backend $backend \
+    "$workdir/$backend" $modules > /dev/null
+done
+diff -r "$workdir/python" "$workdir/libyaml"
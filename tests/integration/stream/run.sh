@@ -0,0 +1,38 @@
+#!/bin/bash
+
+set -euo pipefail
+
+workdir=$(mktemp -d)
+trap "rm -rf $workdir" EXIT
+
+export ANSIBLE_COLLECTIONS_PATH=$(realpath ../doc_fragments)
+collection=../doc_fragments/ansible_collections/sensu/sensu_go
+module=../basic/ad_auth_provider.py
+
+ansible-doc-extractor --collection $collection --format rst --format md \
+  "$workdir/render" $module > /dev/null
+
+# Streamed documents are the same as rendered ones.
+ansible-doc-extractor --stream --collection $collection --format rst \
+  --format md "$workdir/stream" $module > /dev/null
+diff -r "$workdir/render" "$workdir/stream"
+
+# Unchanged streamed documents are not rewritten.
+ansible-doc-extractor --stream --skip-unchanged --collection $collection \
+  --format rst --format md "$workdir/stream" $module > "$workdir/log"
+diff -r "$workdir/render" "$workdir/stream"
+grep -q "^Output files: 0 written, 4 unchanged$" "$workdir/log"
+
+# Changed ones are.
+echo changed > "$workdir/stream/rst/ad_auth_provider.rst"
+ansible-doc-extractor --stream --skip-unchanged --collection $collection \
+  --format rst --format md "$workdir/stream" $module > "$workdir/log"
+diff -r "$workdir/render" "$workdir/stream"
+grep -q "^Output files: 1 written, 3 unchanged$" "$workdir/log"
+
+# Streaming needs whole documents neither in memory nor in archives.
+if ansible-doc-extractor --stream --archive tar "$workdir/docs.tar" $module \
+    > /dev/null 2>&1; then
+  echo "--stream was combined with --archive"
+  exit 1
+fi
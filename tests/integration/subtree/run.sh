@@ -0,0 +1,62 @@
+#!/bin/bash
+
+set -euo pipefail
+
+workdir=$(mktemp -d)
+trap "rm -rf $workdir" EXIT
+
+cp -r ../doc_fragments/ansible_collections "$workdir"
+export ANSIBLE_COLLECTIONS_PATH=$workdir
+collection=$workdir/ansible_collections/sensu/sensu_go
+
+# All modules extend a fragment with a plain option table, which is
+# reused, and an option that refers to another option of the documented
+# plugin, which is rendered for each module. Subtrees are only cached once
+# they were seen before, so the third module is the first to reuse them.
+cat > "$collection/plugins/doc_fragments/connection.py" <<'PYTHON'
+class ModuleDocFragment(object):
+    DOCUMENTATION = """
+options:
+  connection:
+    description: Connection settings.
+    type: dict
+    suboptions:
+      host:
+        description: Host name.
+        type: str
+      port:
+        description: Port number.
+        type: int
+  retries:
+    description: Retries when O(connection) fails.
+    type: int
+"""
+PYTHON
+for name in first second third; do
+  cat > "$collection/plugins/modules/$name.py" <<PYTHON
+DOCUMENTATION = """
+module: $name
+author: Tester (@tester)
+short_description: The $name module
+description: The $name module.
+extends_documentation_fragment: sensu.sensu_go.connection
+"""
+PYTHON
+done
+
+ansible-doc-extractor -j 1 --format rst --format md \
+  --collection "$collection" "$workdir/cached" > "$workdir/log"
+grep -q "^Subtree cache: [1-9][0-9]* hits" "$workdir/log"
+for name in first second third; do
+  grep -q "^ *Retries when .*<ansible_collections.sensu.sensu_go.${name}_module>" \
+    "$workdir/cached/rst/module/$name.rst"
+done
+
+# Cached subtrees render the same documents as the templates do.
+ansible-doc-extractor -j 1 --subtree-cache-size 0 --format rst --format md \
+  --collection "$collection" "$workdir/uncached" > "$workdir/log"
+if grep -q "^Subtree cache:" "$workdir/log"; then
+  echo "Subtree cache was used with --subtree-cache-size 0"
+  exit 1
+fi
+diff -r "$workdir/cached" "$workdir/uncached"
@@ -0,0 +1,74 @@
+#!/bin/bash
+
+set -euo pipefail
+
+workdir=$(mktemp -d)
+pid=
+trap '[ -n "$pid" ] && kill $pid 2> /dev/null; rm -rf $workdir' EXIT
+
+cp -r ../doc_fragments/ansible_collections "$workdir"
+export ANSIBLE_COLLECTIONS_PATH=$workdir
+plugins=$workdir/ansible_collections/sensu/sensu_go/plugins
+module=$plugins/modules/ad_auth_provider.py
+cat > "$workdir/plain.py" <<'PYTHON'
+DOCUMENTATION = """
+module: plain
+author: Tester (@tester)
+short_description: Module without doc fragments
+description: Original description.
+"""
+PYTHON
+
+# Shell background jobs ignore SIGINT, which stops the watcher, and the
+# polling watcher is used on all platforms.
+python -u - "$workdir/out" "$module" "$workdir/plain.py" \
+  > "$workdir/log" 2>&1 <<'PYTHON' &
+import signal
+import sys
+
+from ansible_doc_extractor import watch
+
+signal.signal(signal.SIGINT, signal.default_int_handler)
+watch.get_watcher = lambda: watch.PollingWatcher(interval=0.1)
+watch.watch_docs(sys.argv[1], sys.argv[2:], None, False)
+PYTHON
+pid=$!
+
+function wait_for () {
+  for _ in $(seq 100); do
+    if grep -qs "$1" "$workdir/out/$2"; then
+      return
+    fi
+    sleep 0.1
+  done
+  echo "Timed out waiting for '$1' in $2"
+  cat "$workdir/log"
+  exit 1
+}
+
+function renders () {
+  grep -c "^Rendering $1" "$workdir/log" || true
+}
+
+until grep -q "^Watching for changes" "$workdir/log"; do sleep 0.1; done
+test $(renders "$module") = 1
+test $(renders "$workdir/plain.py") = 1
+
+# A changed doc fragment only renders the modules that extend it.
+sed -i "s/The Sensu resource's name./The renamed resource's name./" \
+  "$plugins/doc_fragments/name.py"
+wait_for "The renamed resource's name." ad_auth_provider.rst
+test $(renders "$module") = 2
+test $(renders "$workdir/plain.py") = 1
+
+# A changed module only renders itself.
+sed -i "s/Original description./Changed description./" "$workdir/plain.py"
+wait_for "Changed description." plain.rst
+sleep 0.5
+test $(renders "$module") = 2
+test $(renders "$workdir/plain.py") = 2
+
+# Ctrl+C stops watching.
+kill -INT $pid
+wait $pid
+pid=
@@ -0,0 +1,120 @@
+#!/bin/bash
+
+set -euo pipefail
+
+workdir=$(mktemp -d)
+trap "rm -rf $workdir" EXIT
+
+export ANSIBLE_COLLECTIONS_PATH=$(realpath ../doc_fragments)
+collection=../doc_fragments/ansible_collections/sensu/sensu_go
+module=../basic/ad_auth_provider.py
+
+ansible-doc-extractor --collection $collection --format rst --format md \
+  "$workdir/sync" $module > /dev/null
+
+# Background writers write the same files, also with a queue that is full
+# all the time.
+for jobs in 1 2; do
+  ansible-doc-extractor -j $jobs --writer-threads 2 --write-queue-size 1 \
+    --collection $collection --format rst --format md \
+    "$workdir/threads-$jobs" $module > "$workdir/log"
+  diff -r "$workdir/sync" "$workdir/threads-$jobs"
+  grep -q "^Background writer: queue high-water mark 1 of 1, " "$workdir/log"
+done
+
+# Unchanged files are counted by the writers.
+ansible-doc-extractor --writer-threads 2 --skip-unchanged \
+  --collection $collection --format rst --format md \
+  "$workdir/sync" $module > "$workdir/log"
+grep -q "^Output files: 0 written, 4 unchanged$" "$workdir/log"
+
+# Modules are only recorded in the build cache once they are written.
+for _ in 1 2; do
+  ansible-doc-extractor --writer-threads 1 --cache-dir "$workdir/cache" \
+    "$workdir/cached" $module > "$workdir/log"
+done
+grep -q "^Skipping" "$workdir/log"
+cmp "$workdir/sync/rst/ad_auth_provider.rst" "$workdir/cached/ad_auth_provider.rst"
+
+# Write errors fail the run.
+mkdir -p "$workdir/broken/ad_auth_provider.rst"
+if ansible-doc-extractor --writer-threads 2 "$workdir/broken" $module \
+    > /dev/null 2>&1; then
+  echo "Failed write was not reported"
+  exit 1
+fi
+
+# A stalled writer pauses rendering in the worker processes, so rendered
+# documents do not pile up in memory.
+mkdir "$workdir/modules"
+for i in $(seq 30); do
+  sed "s/^module: ad_auth_provider$/module: module$i/" $module \
+    > "$workdir/modules/module$i.py"
+done
+python - "$workdir" <<'PYTHON'
+import os
+import sys
+import time
+
+from ansible_doc_extractor import output, render
+
+workdir = sys.argv[1]
+log = os.path.join(workdir, "rendered.log")
+modules = sorted(
+    os.path.join(workdir, "modules", name)
+    for name in os.listdir(os.path.join(workdir, "modules"))
+)
+
+render_module = render.Renderer.render
+
+
+def logged_render(self, *task):
+    # Workers are forked after this is patched in.
+    with open(log, "a") as fd:
+        fd.write(task[1] + "\n")
+    return render_module(self, *task)
+
+
+write_file = output.write_file
+rendered_during_stall = []
+
+
+def stalled_write_file(path, text, skip_unchanged=False):
+    if not rendered_during_stall:
+        time.sleep(2)
+        with open(log) as fd:
+            rendered_during_stall.append(len(fd.readlines()))
+    return write_file(path, text, skip_unchanged)
+
+
+render.Renderer.render = logged_render
+output.write_file = stalled_write_file
+render.render_docs(
+    os.path.join(workdir, "stalled"), modules, None, False, jobs=2,
+    writer_threads=1, write_queue_size=2,
+)
+
+# Two queued modules, one in the writer, one waiting for the queue, and two
+# per worker process.
+assert rendered_during_stall[0] <= 8, rendered_during_stall
+assert len(os.listdir(os.path.join(workdir, "stalled"))) == 30
+PYTHON
+
+# New files get the permissions of the umask and rewritten files keep theirs.
+(
+  umask 027
+  ansible-doc-extractor "$workdir/modes" $module > /dev/null
+  test "$(stat -c %a "$workdir/modes/ad_auth_provider.rst")" = 640
+  chmod 604 "$workdir/modes/ad_auth_provider.rst"
+  ansible-doc-extractor "$workdir/modes" $module > /dev/null
+  test "$(stat -c %a "$workdir/modes/ad_auth_provider.rst")" = 604
+)
+
+# Importing the writer does not change the umask.
+python - <<'PYTHON'
+from unittest import mock
+
+with mock.patch("os.umask") as umask:
+    from ansible_doc_extractor import output  # noqa: F401
+assert not umask.called
+PYTHON